@@ -3,8 +3,11 @@ import networkx as nx
 import matplotlib.pyplot as plt
 import pickle
 
+# local importation
+import manage_stringdb
 
-def build_gene_network(gene_list:list, graph_image_file:str, graph_save_file:str, score_threshold:int):
+
+def build_gene_network(gene_list:list, graph_image_file:str, graph_save_file:str, score_threshold:int, stringdb_source:str="api"):
     """Build a gene graph using gene in gene_list as nodes and stringDB as prior knowledge to build the edges
 
     Args:
@@ -12,42 +15,49 @@ def build_gene_network(gene_list:list, graph_image_file:str, graph_save_file:str
         - graph_image_file (str) : path to save the image of the graph
         - graph_save_file (str) : path to the save file (must be a .pickle)
         - score_treshold (int) : confidence threshold to build an edge between nodes, 700 is considered high confidence
+        - stringdb_source (str) : 'api' to query string-db.org, 'local' to use the downloaded stringdb ressource files
     
     """
 
     # set params
     species = 9606
 
-    # Construire l'URL de STRING API
-    base_url = "https://string-db.org/api"
-    output_format = "tsv-no-header"
-    method = "network"
-    request_url = f"{base_url}/{output_format}/{method}"
+    # get interactions (gene1, gene2, score)
+    if stringdb_source == "local":
+        interactions = [(elt['preferredName_A'], elt['preferredName_B'], elt['score']) for elt in manage_stringdb.query_network(gene_list, score_threshold)]
+    elif stringdb_source == "api":
 
-    # set parameters
-    params = {
-        "identifiers": "%0d".join(gene_list),
-        "species": species,
-        "required_score": score_threshold,
-        "network_type": "functional",
-    }
+        # Construire l'URL de STRING API
+        base_url = "https://string-db.org/api"
+        output_format = "tsv-no-header"
+        method = "network"
+        request_url = f"{base_url}/{output_format}/{method}"
 
-    # Send request to STRING
-    response = requests.post(request_url, data=params)
-    lines = response.text.strip().split("\n")
+        # set parameters
+        params = {
+            "identifiers": "%0d".join(gene_list),
+            "species": species,
+            "required_score": score_threshold,
+            "network_type": "functional",
+        }
 
-    # Build graph
-    G = nx.Graph()
-    for line in lines:
-        items = line.split("\t")
-        if len(items) >= 6:
-            gene1 = items[2]
-            gene2 = items[3]
-            score = float(items[5])
+        # Send request to STRING
+        response = requests.post(request_url, data=params)
+        lines = response.text.strip().split("\n")
+        interactions = []
+        for line in lines:
+            items = line.split("\t")
+            if len(items) >= 6:
+                interactions.append((items[2], items[3], float(items[5])))
+    else:
+        raise ValueError(f"unknown stringdb source {stringdb_source}, should be 'api' or 'local'")
 
-            # make sure we are using only genes present in gene_list
-            if gene1 in gene_list and gene2 in gene_list:
-                G.add_edge(gene1, gene2, weight=score)
+    # Build graph, make sure we are using only genes present in gene_list
+    G = nx.Graph()
+    genes = set(gene_list)
+    for gene1, gene2, score in interactions:
+        if gene1 in genes and gene2 in genes:
+            G.add_edge(gene1, gene2, weight=score)
 
     # save graph data
     pickle.dump(G, open(graph_save_file, 'wb'))
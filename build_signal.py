@@ -2,20 +2,28 @@ import pandas as pd
 import numpy as np
 import random
 import os
+import glob
 from scipy.io.wavfile import write
 from scipy.interpolate import interp1d
-from mygene import MyGeneInfo
 import requests
 from itertools import chain
 
+# local importation
+import manage_stringdb
+import manage_identifiers
 
-def build_random_signal(data_file:str, output_folder:str):
-    """Build signals from data file, assign random order and random interval to genes
-    Create one signal file per patient
+# max number of identifiers sent per stringdb API request
+STRINGDB_API_BATCH_SIZE = 1000
+
+
+def build_random_positions(genes:list) -> dict:
+    """Assign a random order and random intervals (between 2 and 5) to genes, first gene is at position 0
 
     Args:
-        - data_file (str) : path to the data_file
-        - output_folder (str) : path to the output folder
+        - genes (list) : list of genes
+
+    Returns:
+        - (dict) : gene to position
     
     """
 
@@ -23,12 +31,8 @@ def build_random_signal(data_file:str, output_folder:str):
     min_dist = 2
     max_dist = 5
 
-    # laod data
-    df = pd.read_csv(data_file)
-
     # define a random order of genes
-    gene_list = list(df.keys())[1:]
-    gene_list = np.random.permutation(gene_list)
+    gene_list = np.random.permutation(genes)
 
     # define random interval between genes
     distances = [random.randint(min_dist, max_dist) for _ in range(len(gene_list) - 1)]
@@ -38,32 +42,91 @@ def build_random_signal(data_file:str, output_folder:str):
     for d in distances:
         x_positions.append(x_positions[-1] + d)
 
-    # Build signal - y part
-    id_to_y = {}
-    for index, row in df.iterrows():
-        y = []
-        for gene in gene_list:
-            y.append(row[gene])
-        id_to_y[row['ID']] = y
+    return {str(gene): x for gene, x in zip(gene_list, x_positions)}
+
+
+def build_random_signal(data_file:str, output_folder:str):
+    """Build signals from data file, assign random order and random interval to genes
+    Create one signal file per patient
+
+    Args:
+        - data_file (str) : path to the data_file
+        - output_folder (str) : path to the output folder
+    
+    """
+
+    # laod data
+    df = pd.read_csv(data_file)
+
+    # build & save signal
+    gene_to_pos = build_random_positions(list(df.keys())[1:])
+    save_signal_matrix(build_signal_matrix(df, gene_to_pos), output_folder)
+
+
+def build_signal_matrix(df:pd.DataFrame, gene_to_pos:dict) -> dict:
+    """Build signals for all patients at once from pre-computed positions for each genes.
+    Expression columns are reordered once following gene_to_pos, giving a (patients x genes)
+    y-matrix and a x-vector shared by every patient
+
+    Args:
+        - df (pd.DataFrame) : data, must contain an ID column and one column per gene in gene_to_pos
+        - gene_to_pos (dict) : gene to position
+
+    Returns:
+        - (dict) : signal matrix, with keys 'ids' (np.array of patient ids), 'genes' (list of genes),
+                   'x' (np.array of positions, one per gene) and 'y' (np.array of shape patients x genes)
+    
+    """
+
+    # reorder columns once
+    gene_list = list(gene_to_pos.keys())
+    y = df[gene_list].to_numpy(dtype=float)
+    x = np.array([gene_to_pos[gene] for gene in gene_list], dtype=float)
+
+    return {"ids":df['ID'].to_numpy(), "genes":gene_list, "x":x, "y":y}
+
+
+def save_signal_matrix(signal_matrix:dict, output_folder:str) -> None:
+    """Save a signal matrix as one signal file per patient ({ID}_signal.csv with x,y columns)
+
+    Args:
+        - signal_matrix (dict) : signal matrix, as returned by build_signal_matrix
+        - output_folder (str) : path to the output folder
+    
+    """
 
-    # craft & save signal
+    # init output folder
     if not os.path.isdir(output_folder):
         os.mkdir(output_folder)
 
     # loop over patients
-    for i in id_to_y:
+    x_positions = signal_matrix['x']
+    for i, y in zip(signal_matrix['ids'], signal_matrix['y']):
+        pd.DataFrame({"x":x_positions, "y":y}).to_csv(f"{output_folder}/{i}_signal.csv", index=False)
 
-        # vars
-        cmpt = 0
-        y = id_to_y[i]
 
-        # save signal in file
-        output_file = open(f"{output_folder}/{i}_signal.csv", "w")
-        output_file.write("x,y\n")
-        for x in x_positions:
-            output_file.write(f"{x},{y[cmpt]}\n")
-            cmpt+=1
-        output_file.close()
+def load_signal_matrix(signal_folder:str) -> dict:
+    """Load the signal files ({ID}_signal.csv) of a folder as a signal matrix, all signals must share the same positions
+
+    Args:
+        - signal_folder (str) : path to the folder containing the signal files
+
+    Returns:
+        - (dict) : signal matrix (see build_signal_matrix), genes are not known and set to None
+    
+    """
+    ids = []
+    y = []
+    x = None
+    for signal_file in sorted(glob.glob(f"{signal_folder}/*_signal.csv")):
+        df = pd.read_csv(signal_file)
+        if x is None:
+            x = df['x'].to_numpy(dtype=float)
+        elif not np.array_equal(x, df['x'].to_numpy(dtype=float)):
+            raise ValueError(f"[!] {signal_file} does not share positions with other signals of {signal_folder}")
+        ids.append(os.path.basename(signal_file).replace("_signal.csv", ""))
+        y.append(df['y'].to_numpy(dtype=float))
+    return {"ids":np.array(ids, dtype=object), "genes":None, "x":x, "y":np.array(y)}
 
 
 def build_signal_from_computed_positions(data_file:str, output_folder:str, gene_to_pos:dict):
@@ -79,39 +142,11 @@ def build_signal_from_computed_positions(data_file:str, output_folder:str, gene_
 
     # laod data
     df = pd.read_csv(data_file)
-    gene_list = list(gene_to_pos.keys())
-    
-    # Build signal
-    id_to_x = {}
-    id_to_y = {}
-    for index, row in df.iterrows():
-        y = []
-        x = []
-        for gene in gene_list:
-            y.append(row[gene])
-            x.append(gene_to_pos[gene])
-        id_to_y[row['ID']] = y
-        id_to_x[row['ID']] = x
-
-    # craft & save signal
-    if not os.path.isdir(output_folder):
-        os.mkdir(output_folder)
 
-    # loop over patients
-    for i in id_to_y:
+    # build & save signal
+    signal_matrix = build_signal_matrix(df, gene_to_pos)
+    save_signal_matrix(signal_matrix, output_folder)
 
-        # vars
-        cmpt = 0
-        y = id_to_y[i]
-        x_positions = id_to_x[i]
-
-        # save signal in file
-        output_file = open(f"{output_folder}/{i}_signal.csv", "w")
-        output_file.write("x,y\n")
-        for x in x_positions:
-            output_file.write(f"{x},{y[cmpt]}\n")
-            cmpt+=1
-        output_file.close()
 
 def build_signal_from_computed_positions_multilabel(data_file:str, output_folder:str, gene_to_pos:dict):
     """Build signal from pre-computed positions for each genes
@@ -130,44 +165,14 @@ def build_signal_from_computed_positions_multilabel(data_file:str, output_folder
         
     # laod data
     df = pd.read_csv(data_file)
-    gene_list = list(gene_to_pos.keys())
 
     label_list = list(set(list(df['LABEL'])))
     for label in label_list:
         df_label = df[df['LABEL'] == label]
-        df_label = df_label.drop(columns=['LABEL'])
-    
-        # Build signal
-        id_to_x = {}
-        id_to_y = {}
-        for index, row in df_label.iterrows():
-            y = []
-            x = []
-            for gene in gene_list:
-                y.append(row[gene])
-                x.append(gene_to_pos[gene])
-            id_to_y[row['ID']] = y
-            id_to_x[row['ID']] = x
-
-        # craft & save signal
-        if not os.path.isdir(f"{output_folder}/{label}"):
-            os.mkdir(f"{output_folder}/{label}")
-
-        # loop over patients
-        for i in id_to_y:
-
-            # vars
-            cmpt = 0
-            y = id_to_y[i]
-            x_positions = id_to_x[i]
-
-            # save signal in file
-            output_file = open(f"{output_folder}/{label}/{i}_signal.csv", "w")
-            output_file.write("x,y\n")
-            for x in x_positions:
-                output_file.write(f"{x},{y[cmpt]}\n")
-                cmpt+=1
-            output_file.close()
+
+        # build & save signal
+        signal_matrix = build_signal_matrix(df_label, gene_to_pos)
+        save_signal_matrix(signal_matrix, f"{output_folder}/{label}")
 
 
 def ensembl_to_uniprot(ensembl_ids:list) -> dict:
@@ -184,46 +189,49 @@ def ensembl_to_uniprot(ensembl_ids:list) -> dict:
     # drop part after dots in id
     ensembl_ids = [i.split('.')[0] for i in ensembl_ids]
 
-    # run request
-    mg = MyGeneInfo()
-    results = mg.querymany(ensembl_ids, scopes='ensembl.gene', fields='uniprot', species='human')
+    # look in local identifier database, fall back on mygene
+    results = manage_identifiers.map_identifiers(ensembl_ids, "ensembl", "uniprot", use_mygene=True)
     gene_to_uniprot = {}
 
     # extract results
-    for res in results:
-        if 'uniprot' in res:
-            up = res['uniprot']
-            if isinstance(up, dict):
-                gene_to_uniprot[res['query']] = up.get('Swiss-Prot') or up.get('TrEMBL')
-            else:
-                gene_to_uniprot[res['query']] = up
+    for gene in results:
+        up = results[gene]
+        if len(up) == 1:
+            gene_to_uniprot[gene] = up[0]
+        else:
+            gene_to_uniprot[gene] = up
     
     return gene_to_uniprot
 
 
-def get_string_ids(uniprot_ids:list) -> dict:
+def get_string_ids(uniprot_ids:list, stringdb_source:str="api", batch_size:int=STRINGDB_API_BATCH_SIZE) -> dict:
     """Use uniprot ids to get string ids
 
     Args:
         - uniprot_ids (list) : list of uniprot_ids
+        - stringdb_source (str) : 'api' to query string-db.org, 'local' to use the downloaded stringdb ressource files
+        - batch_size (int) : number of ids sent per API request
 
     Returns:
         (dict) : uniprot ids to string id 
     
     """
 
-    # params
-    species=9606    
-    identifiers = '\r'.join(uniprot_ids)
-    params = {
-        'identifiers': identifiers,
-        'species': species,
-        'caller_identity': 'gene_in_music'
-    }
-
-    # call API
-    response = requests.post("https://string-db.org/api/json/get_string_ids", data=params)
-    data = response.json()
+    # local ressource files
+    if stringdb_source == "local":
+        data = manage_stringdb.query_string_ids(uniprot_ids)
+
+    # call API, by batch to avoid too large requests
+    else:
+        data = []
+        for i in range(0, len(uniprot_ids), batch_size):
+            params = {
+                'identifiers': '\r'.join(uniprot_ids[i:i+batch_size]),
+                'species': 9606,
+                'caller_identity': 'gene_in_music'
+            }
+            response = requests.post("https://string-db.org/api/json/get_string_ids", data=params)
+            data += response.json()
 
     # extract data
     uniprot_to_string = {item['queryItem']: item['stringId'] for item in data}
@@ -231,17 +239,22 @@ def get_string_ids(uniprot_ids:list) -> dict:
     return uniprot_to_string
 
 
-def get_string_interactions(string_ids:list):
+def get_string_interactions(string_ids:list, stringdb_source:str="api"):
     """Get interactions between strings ids
 
     Args:
         - string_ids (list) : list of string ids
+        - stringdb_source (str) : 'api' to query string-db.org, 'local' to use the downloaded stringdb ressource files
 
     Returns:
         - (json) : list of dict containing interaction results
     
     """
 
+    # local ressource files
+    if stringdb_source == "local":
+        return manage_stringdb.query_network(string_ids)
+
     # params
     species=9606
     identifiers = '\r'.join(string_ids)
@@ -332,6 +345,118 @@ def build_gene_similarity_matrix(genes, gene_to_proteins, protein_similarity_mat
 
 
 
+def turn_signal_into_waveform(x:np.array, y:np.array, target_duration:float, sample_rate:int=44100) -> np.array:
+    """Turn a signal (x, y) into a waveform sampled at sample_rate, normalized between -1 and 1
+
+    Args:
+        - x (np.array) : positions of the genes
+        - y (np.array) : expression of the genes
+        - target_duration (float) : duration of the waveform (seconds)
+        - sample_rate (int) : sample rate of the waveform, default to 44.1 kHz
+
+    Returns:
+        - (np.array) : waveform, as a 1d array
+    
+    """
+
+    # Redimensionner x pour fit la target_duration
+    x = (x - x[0]) / (x[-1] - x[0]) * target_duration
+
+    # audio stuff
+    duration = x[-1]
+    t = np.linspace(0, duration, int(sample_rate * duration))
+
+    # Interpolation pour obtenir des y réguliers
+    interpolateur = interp1d(x, y, kind='linear')
+    y_interp = interpolateur(t)
+
+    # Normaliser entre -1 et 1
+    return y_interp / np.max(np.abs(y_interp))
+
+
+def synthesize_waveforms(y:np.array, x:np.array, target_duration:float, sample_rate:int=44100, batch_size:int=16) -> np.array:
+    """Render the waveforms of all patients at once. All patients share the same x vector, so the
+    time grid and the linear interpolation weights are computed only once and applied to the whole
+    (patients x genes) matrix. Gives the same waveforms as turn_signal_into_waveform, including for unsorted
+    positions (x is scaled from its first & last values, not from its min & max).
+
+    Args:
+        - y (np.array) : expression matrix of shape (patients x genes)
+        - x (np.array) : positions of the genes, shared by all patients
+        - target_duration (float) : duration of the waveforms (seconds)
+        - sample_rate (int) : sample rate of the waveforms, default to 44.1 kHz
+        - batch_size (int) : number of patients rendered together, bound the memory used by temporary arrays
+
+    Returns:
+        - (np.array) : waveforms, float32 array of shape (patients x samples), each row normalized between -1 and 1
+    
+    """
+
+    # Redimensionner x pour fit la target_duration, from first & last genes like turn_signal_into_waveform
+    x = np.asarray(x, dtype=float)
+    x = (x - x[0]) / (x[-1] - x[0]) * target_duration
+
+    # shared time grid
+    duration = x[-1]
+    t = np.linspace(0, duration, int(sample_rate * duration))
+
+    # sort genes by position for interpolation, as interp1d does
+    order = np.argsort(x, kind='stable')
+    x = x[order]
+    y = np.asarray(y, dtype=float)[:, order]
+
+    # shared interpolation weights, same bracketing as interp1d
+    hi = np.clip(np.searchsorted(x, t), 1, len(x) - 1)
+    lo = hi - 1
+    dx = x[hi] - x[lo]
+    w = np.divide(t - x[lo], dx, out=np.zeros_like(t), where=dx > 0)
+
+    # render waveforms
+    waveforms = np.empty((y.shape[0], len(t)), dtype=np.float32)
+    for start in range(0, y.shape[0], batch_size):
+        y_batch = y[start:start+batch_size]
+        y_interp = y_batch[:, lo] + (y_batch[:, hi] - y_batch[:, lo]) * w
+        waveforms[start:start+batch_size] = y_interp / np.max(np.abs(y_interp), axis=1, keepdims=True)
+
+    return waveforms
+
+
+def turn_signal_matrix_into_waveforms(signal_matrix:dict, target_duration:float) -> np.array:
+    """Turn each patient signal of a signal matrix into a waveform, in memory
+
+    Args:
+        - signal_matrix (dict) : signal matrix, as returned by build_signal_matrix
+        - target_duration (float) : duration of the waveforms (seconds)
+
+    Returns:
+        - (np.array) : float32 waveforms of shape (patients x samples), in the same order as signal_matrix['ids']
+    
+    """
+    return synthesize_waveforms(signal_matrix['y'], signal_matrix['x'], target_duration)
+
+
+def turn_signal_matrix_into_audio(signal_matrix:dict, output_folder:str, target_duration:float) -> None:
+    """Turn each patient signal of a signal matrix into an audio signal and save it in a
+    wave file ({ID}_signal.wav), use batched synthesis
+
+    Args:
+        - signal_matrix (dict) : signal matrix, as returned by build_signal_matrix
+        - output_folder (str) : path to the output folder
+        - target_duration (float) : duration of the audio files (seconds)
+    
+    """
+
+    # init output folder
+    if not os.path.isdir(output_folder):
+        os.mkdir(output_folder)
+
+    # render & save all waveforms
+    sample_rate = 44100  # 44.1 kHz
+    waveforms = synthesize_waveforms(signal_matrix['y'], signal_matrix['x'], target_duration, sample_rate)
+    for i, waveform in zip(signal_matrix['ids'], waveforms):
+        write(f"{output_folder}/{i}_signal.wav", sample_rate, np.int16(waveform * 32767))
+
+
 def turn_signal_into_audio(signal_file:str, target_duration:float) -> None:
     """Turn a signal extracted from data file to an audio signal and save it in
     a wave file
@@ -347,20 +472,12 @@ def turn_signal_into_audio(signal_file:str, target_duration:float) -> None:
     x = np.array(list(df['x']))
     y = np.array(list(df['y']))
 
-    # Redimensionner x pour fit la target_duration
-    x = (x - x[0]) / (x[-1] - x[0]) * target_duration
-
     # audio stuff
     sample_rate = 44100  # 44.1 kHz
-    duration = x[-1]
-    t = np.linspace(0, duration, int(sample_rate * duration))
-
-    # Interpolation pour obtenir des y réguliers
-    interpolateur = interp1d(x, y, kind='linear')
-    y_interp = interpolateur(t)
+    waveform = turn_signal_into_waveform(x, y, target_duration, sample_rate)
 
     # Normaliser pour correspondre à une plage 16-bit
-    y_norm = np.int16(y_interp / np.max(np.abs(y_interp)) * 32767)
+    y_norm = np.int16(waveform * 32767)
 
     # Sauvegarder dans un fichier WAV
     write(signal_file.replace(".csv", ".wav"), sample_rate, y_norm)
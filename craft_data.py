@@ -1,13 +1,46 @@
 import pandas as pd
+import numpy as np
 from functools import reduce
 import random
-import mygene
 import os
 import shutil
+import io
 
 # local module
 import get_data
 
+# mart ressource file, indexed once per process by load_mart_index
+MART_FILE = "data/mart_export.txt"
+MART_INDEX = {}
+
+
+def load_mart_index(data_file:str=MART_FILE) -> dict:
+    """Load the manually downloaded mart ressource file once per process and index its rows by entrez gene
+
+    Args:
+        - data_file (str) : path to the mart export file
+
+    Returns:
+        - (dict) : ensembl (ensembl gene of each row, file order) and entrez_to_rows (entrez gene to list of rows)
+    
+    """
+
+    if data_file not in MART_INDEX:
+
+        # load data
+        df = pd.read_csv(data_file)
+        df = df[['NCBI gene (formerly Entrezgene) ID', 'Gene stable ID']]
+        df = df.dropna()
+        df['NCBI gene (formerly Entrezgene) ID'] = df['NCBI gene (formerly Entrezgene) ID'].astype(int).astype(str)
+
+        # index rows
+        entrez_to_rows = {}
+        for row, entrez in enumerate(df['NCBI gene (formerly Entrezgene) ID']):
+            entrez_to_rows.setdefault(entrez, []).append(row)
+        MART_INDEX[data_file] = {"ensembl":df['Gene stable ID'].to_numpy(), "entrez_to_rows":entrez_to_rows}
+
+    return MART_INDEX[data_file]
+
 
 def entrez_to_ensembl(entrez_gene_list:list) -> list:
     """Use a manually downloaded ressource file to convert a list of entre gene into a list
@@ -17,53 +50,122 @@ def entrez_to_ensembl(entrez_gene_list:list) -> list:
         - entrez_gene_list (list) : list of entrez gene
 
     Returns:
-        - (list) : list of ensembl genes
+        - (list) : list of ensembl genes, in the order of the ressource file
     
     """
 
-    # param
-    data_file = "data/mart_export.txt"
-
-    # load data
-    df = pd.read_csv(data_file)
-    df = df[['NCBI gene (formerly Entrezgene) ID', 'Gene stable ID']]
-    df = df.dropna()
-    df['NCBI gene (formerly Entrezgene) ID'] = df['NCBI gene (formerly Entrezgene) ID'].astype(int).astype(str)
-
-    # get gene to scan
-    to_scan = []
-    for g in entrez_gene_list:
-        if g in list(df['NCBI gene (formerly Entrezgene) ID']) and g not in to_scan:
-            to_scan.append(g)
-    df = df[df['NCBI gene (formerly Entrezgene) ID'].isin(to_scan)]
+    # get rows of genes to scan
+    index = load_mart_index()
+    rows = []
+    for g in set(entrez_gene_list):
+        rows += index['entrez_to_rows'].get(g, [])
 
     # get ensembl genes
-    ensembl_gene_list = list(df['Gene stable ID'])
+    ensembl_gene_list = list(index['ensembl'][sorted(rows)])
 
     return ensembl_gene_list
 
+
+def entrez_sets_to_ensembl(gene_sets:dict) -> dict:
+    """Convert all gene sets (e.g loaded from a gmt file) from entrez genes to ensembl genes
+
+    Args:
+        - gene_sets (dict) : gene set name to list of entrez genes
+
+    Returns:
+        - (dict) : gene set name to list of ensembl genes
+    
+    """
+    return {gene_set:entrez_to_ensembl(gene_sets[gene_set]) for gene_set in gene_sets}
+
     
             
 
 
-def read_gct(filepath:str) -> pd.DataFrame:
-    """Load content of a gct file into dataframe and return it
+def read_gct_header(filepath:str) -> list:
+    """Read the column names of a gct file (Name, Description and samples)
+
+    Args:
+        - filepath (str) : path to the gct file
+
+    Returns:
+        - (list) : column names
+    
+    """
+    with open(filepath, 'r') as f:
+        f.readline()
+        f.readline()
+        return f.readline().rstrip("\n").split("\t")
+
+
+def read_gct_names(filepath:str) -> list:
+    """Read only the gene names (Name column) of a gct file, without parsing expression values
 
     Args:
         - filepath (str) : path to the gct file
+
+    Returns:
+        - (list) : gene names, in file order
     
     """
+    with open(filepath, 'r') as f:
+        for i in range(3):
+            f.readline()
+        return [line.split("\t", 1)[0] for line in f if line.strip()]
+
+
+def iter_gct(filepath:str, genes:list=None, dtype=None, chunksize:int=10000):
+    """Stream the content of a gct file in one pass, as dataframes of at most chunksize genes, only lines of
+    selected genes are parsed
+
+    Args:
+        - filepath (str) : path to the gct file
+        - genes (list) : genes (Name column) to load, all genes if None
+        - dtype : type of expression values (e.g np.float32), inferred by pandas if None
+        - chunksize (int) : max number of genes per dataframe
 
-    # vibe coding
+    Returns:
+        - (generator) : dataframes with columns Name, Description and samples
+    
+    """
+    genes = None if genes is None else set(genes)
     with open(filepath, 'r') as f:
-        version = f.readline().strip()
-        dims = f.readline().strip().split()
-        n_rows, n_cols = map(int, dims)
+        f.readline()
+        f.readline()
+        columns = f.readline().rstrip("\n").split("\t")
+        dtypes = {'Name':str, 'Description':str}
+        if dtype is not None:
+            dtypes.update({c:dtype for c in columns[2:]})
+
+        # accumulate lines of selected genes, parse them by chunks
+        lines = []
+        for line in f:
+            if line.strip() and (genes is None or line.split("\t", 1)[0] in genes):
+                lines.append(line)
+            if len(lines) == chunksize:
+                yield pd.read_csv(io.StringIO("".join(lines)), sep='\t', header=None, names=columns, dtype=dtypes)
+                lines = []
+        if len(lines) > 0:
+            yield pd.read_csv(io.StringIO("".join(lines)), sep='\t', header=None, names=columns, dtype=dtypes)
+
+
+def read_gct(filepath:str, genes:list=None, dtype=None, chunksize:int=10000) -> pd.DataFrame:
+    """Load content of a gct file into dataframe and return it
 
-    # Now read the rest of the file as a regular table
-    df = pd.read_csv(filepath, sep='\t', skiprows=2)
+    Args:
+        - filepath (str) : path to the gct file
+        - genes (list) : genes (Name column) to load, all genes if None
+        - dtype : type of expression values (e.g np.float32), inferred by pandas if None
+        - chunksize (int) : number of genes parsed at once
 
-    return df
+    Returns:
+        - (pd.DataFrame) : columns are Name, Description and samples
+    
+    """
+    chunks = list(iter_gct(filepath, genes, dtype, chunksize))
+    if len(chunks) == 0:
+        return pd.DataFrame(columns=read_gct_header(filepath))
+    return pd.concat(chunks, ignore_index=True)
 
 
 def pick_random_genes(gct_file_list:list, n_pick:int) -> list:
@@ -81,8 +183,7 @@ def pick_random_genes(gct_file_list:list, n_pick:int) -> list:
     # look for genes in data
     gene_list_list = []
     for gct_file in gct_file_list:
-        df = read_gct(gct_file)
-        gene_list_list.append(list(df['Name']))
+        gene_list_list.append(read_gct_names(gct_file))
 
     # compute intersection
     gene_list = list(reduce(lambda a, b: set(a) & set(b), gene_list_list))
@@ -108,11 +209,10 @@ def craft_reduce_datasets(gct_file_list:list, n_genes:int) -> None:
     # craft a dataset for each gct file
     for gct_file in gct_file_list:
 
-        # load
-        df = read_gct(gct_file)
+        # load selected genes
+        df = read_gct(gct_file, genes=gene_list, dtype=np.float32)
 
         # reformat
-        df = df[df['Name'].isin(gene_list)]
         df = df.drop(columns=['Description'])
         df = df.rename(columns={'Name':'ID'})
         df = df.set_index('ID')
@@ -137,8 +237,7 @@ def craft_datasets(gct_file_list:list) -> None:
     # look for genes in data
     gene_list_list = []
     for gct_file in gct_file_list:
-        df = read_gct(gct_file)
-        gene_list_list.append(list(df['Name']))
+        gene_list_list.append(read_gct_names(gct_file))
 
     # compute intersection
     gene_list = list(reduce(lambda a, b: set(a) & set(b), gene_list_list))
@@ -146,11 +245,10 @@ def craft_datasets(gct_file_list:list) -> None:
     # craft a dataset for each gct file
     for gct_file in gct_file_list:
 
-        # load
-        df = read_gct(gct_file)
+        # load selected genes
+        df = read_gct(gct_file, genes=gene_list, dtype=np.float32)
 
         # reformat
-        df = df[df['Name'].isin(gene_list)]
         df = df.drop(columns=['Description'])
         df = df.rename(columns={'Name':'ID'})
         df = df.set_index('ID')
@@ -183,8 +281,7 @@ def craft_gsea_dataset(gct_file_list:list, gmt_file:str, output_folder:str) -> N
     # look for genes in data
     gene_list_list = []
     for gct_file in gct_file_list:
-        df = read_gct(gct_file)
-        gene_list_list.append(list(df['Name']))
+        gene_list_list.append(read_gct_names(gct_file))
 
     # compute intersection
     gene_intersection_list = list(reduce(lambda a, b: set(a) & set(b), gene_list_list))
@@ -198,17 +295,16 @@ def craft_gsea_dataset(gct_file_list:list, gmt_file:str, output_folder:str) -> N
             genes = parts[2:]  # on ignore la description
             gene_sets[name] = genes
 
-    # init mygene stuff
-    mg = mygene.MyGeneInfo()
+    # convert entrez gene from gmt data to ensembl gene to match gct files
+    ensembl_gene_sets = entrez_sets_to_ensembl(gene_sets)
     
     # craft a dataset for each gct file
     for gct_file in gct_file_list:
 
-        # load
-        df = read_gct(gct_file)
+        # load selected genes
+        df = read_gct(gct_file, genes=gene_intersection_list, dtype=np.float32)
 
         # reformat
-        df = df[df['Name'].isin(gene_intersection_list)]
         df = df.drop(columns=['Description'])
         df = df.rename(columns={'Name':'ID'})
         df = df.set_index('ID')
@@ -220,18 +316,14 @@ def craft_gsea_dataset(gct_file_list:list, gmt_file:str, output_folder:str) -> N
         df.columns = df.columns.str.replace(r"\.\d+$", "", regex=True)
 
         # split to gene set
+        available_genes = set(df.keys())
         for gene_set in gene_sets:
-            gene_list = gene_sets[gene_set]
-
-
-            # WARN
-            # convert entrez gene from gmt data to ensembl gene to match gct files
-            ensembl_gene_list = entrez_to_ensembl(gene_list) 
+            ensembl_gene_list = ensembl_gene_sets[gene_set]
                         
             # select ensembl gene found in data
             ensembl_gene_list_to_keep = ['ID']
             for ensembl_gene in ensembl_gene_list:
-                if ensembl_gene in list(df.keys()):
+                if ensembl_gene in available_genes:
                     ensembl_gene_list_to_keep.append(ensembl_gene)
 
             # create subset
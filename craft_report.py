@@ -219,12 +219,15 @@ def extract_data_infos(signal_folder:str) -> dict:
                 class_folder_list.append(cfld)
     infos['n_class'] = len(class_folder_list)
 
-    # get class to n_samples
+    # get class to n_samples, count sample ids when no audio file was written
     for class_folder in class_folder_list:
         class_name = class_folder.split("/")[-1]
         infos[f"n_{class_name}"] = 0
         for sig_file in glob.glob(f"{class_folder}/*.wav"):
             infos[f"n_{class_name}"] += 1
+        if infos[f"n_{class_name}"] == 0 and os.path.isfile(f"{class_folder}/ids.txt"):
+            with open(f"{class_folder}/ids.txt", "r") as f:
+                infos[f"n_{class_name}"] = sum(1 for line in f if line.strip())
 
     return infos               
 
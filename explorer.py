@@ -6,6 +6,7 @@ import os
 
 # import module
 import run
+import extract_features
 
 
 
@@ -34,15 +35,20 @@ def run_binary_exploration():
         Q = combo[1]
         audio_duration = combo[2]
         output_folder = "/tmp/scatexplore"
+        feature_store = "/tmp/scatexplore_features"
+        n_jobs = -1
         preprocess_data = True
 
         # run
-        run.simple_binary_gsea_run(output_folder, True, audio_duration, J, Q)
+        run.simple_binary_gsea_run(output_folder, True, audio_duration, J, Q, feature_store, n_jobs, save_artifacts=False)
 
         # save results
         shutil.copy("/tmp/scatexplore/report/report.md", f"exploration/report_{cmpt}.md")
         shutil.copy("/tmp/scatexplore/report/report.pdf", f"exploration/report_{cmpt}.pdf")
         cmpt +=1
+
+    # release feature extraction workers, kept alive across combinations
+    extract_features.close_feature_pools()
         
 
 
@@ -1,10 +1,67 @@
+import os
 import librosa
 import torch
 import numpy as np
 import matplotlib.pyplot as plt
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from kymatio.torch import Scattering1D
 
 
+# cache of scattering operators, keyed by (J, Q, signal length)
+SCATTERING_CACHE = OrderedDict()
+SCATTERING_CACHE_SIZE = 8
+SCATTERING_CACHE_STATS = {"hits":0, "misses":0, "evictions":0}
+
+# feature extraction process pools of the current process, keyed by number of workers
+FEATURE_POOLS = {}
+
+
+def get_scattering(J:int, Q:int, length:int) -> Scattering1D:
+    """Get a scattering operator from the cache, build it (and evict the least recently used operator
+    if the cache is full) only if it does not exist yet
+
+    Args:
+        J (int) : Nombre d'échelles (contrôle la résolution temps/fréquence)
+        Q (int) : Nombre de bandes de fréquences par octave 
+        length (int) : length of the signals to transform
+
+    Returns:
+        Scattering1D : scattering operator
+    
+    """
+
+    # look in cache
+    key = (J, Q, length)
+    if key in SCATTERING_CACHE:
+        SCATTERING_CACHE_STATS["hits"] += 1
+        SCATTERING_CACHE.move_to_end(key)
+        return SCATTERING_CACHE[key]
+
+    # build operator & evict old ones
+    SCATTERING_CACHE_STATS["misses"] += 1
+    scattering = Scattering1D(J=J, shape=(length,), Q=Q)
+    SCATTERING_CACHE[key] = scattering
+    while len(SCATTERING_CACHE) > SCATTERING_CACHE_SIZE:
+        SCATTERING_CACHE.popitem(last=False)
+        SCATTERING_CACHE_STATS["evictions"] += 1
+
+    return scattering
+
+
+def get_scattering_cache_stats() -> dict:
+    """Return hits, misses and evictions counters of the scattering operator cache"""
+    return dict(SCATTERING_CACHE_STATS, size=len(SCATTERING_CACHE))
+
+
+def clear_scattering_cache() -> None:
+    """Drop all cached scattering operators and reset counters"""
+    SCATTERING_CACHE.clear()
+    for k in SCATTERING_CACHE_STATS:
+        SCATTERING_CACHE_STATS[k] = 0
+
+
 def extract_features(audio_path:str, J:int, Q:int):
     """Extract features from audio file
     
@@ -22,11 +79,27 @@ def extract_features(audio_path:str, J:int, Q:int):
     # Charger l'audio
     y, sr = librosa.load(audio_path, sr=None)  # sr=None pour garder le taux d'échantillonnage original
 
+    return extract_features_from_waveform(y, J, Q)
+
+
+def extract_features_from_waveform(y:np.array, J:int, Q:int):
+    """Extract features from a waveform already loaded in memory
+    
+    Args:
+        y (np.array) : waveform
+        J (int) : Nombre d'échelles (contrôle la résolution temps/fréquence)
+        Q (int) : Nombre de bandes de fréquences par octave 
+
+    Returns:
+        tensor : extracted features
+    
+    """
+
     # Normalisation
     y = y / np.max(np.abs(y))  # Normaliser entre -1 et 1
 
     # Définition du module de Scattering
-    scattering = Scattering1D(J=J, shape=(len(y),), Q=Q)
+    scattering = get_scattering(J, Q, len(y))
 
     # Conversion en tenseur PyTorch
     y_torch = torch.from_numpy(y).float()
@@ -36,6 +109,101 @@ def extract_features(audio_path:str, J:int, Q:int):
 
     return scattered_features
 
+
+def init_feature_worker(n_threads:int) -> None:
+    """Initialize a feature extraction worker, pin the number of torch threads so that n_jobs
+    workers do not oversubscribe the cpu"""
+    torch.set_num_threads(n_threads)
+
+
+def get_feature_pool(n_jobs:int) -> ProcessPoolExecutor:
+    """Get a feature extraction process pool of n_jobs workers, created on first use and then reused
+    by every call so that workers (and their scattering operators) are not spawned again
+
+    Args:
+        n_jobs (int) : number of worker processes
+
+    Returns:
+        ProcessPoolExecutor : feature extraction pool
+    
+    """
+    if n_jobs not in FEATURE_POOLS:
+        n_threads = max(1, os.cpu_count() // n_jobs)
+        FEATURE_POOLS[n_jobs] = ProcessPoolExecutor(max_workers=n_jobs, mp_context=multiprocessing.get_context("spawn"), initializer=init_feature_worker, initargs=(n_threads,))
+    return FEATURE_POOLS[n_jobs]
+
+
+def close_feature_pools() -> None:
+    """Shut down all feature extraction pools of the current process"""
+    for executor in FEATURE_POOLS.values():
+        executor.shutdown()
+    FEATURE_POOLS.clear()
+
+
+def extract_features_batch(inputs:list, J:int, Q:int, batch_size:int=32, n_jobs:int=1) -> np.array:
+    """Extract features from a stack of equal-length waveforms, run the scattering transform
+    on batch_size waveforms at a time to bound memory
+
+    Args:
+        inputs (list) : list of path to audio files or of waveforms (a 2d array of waveforms works too)
+        J (int) : Nombre d'échelles (contrôle la résolution temps/fréquence)
+        Q (int) : Nombre de bandes de fréquences par octave 
+        batch_size (int) : number of waveforms transformed together
+        n_jobs (int) : number of worker processes, inputs are split in chunks of ceil(N / n_jobs) waveforms
+                       (at most batch_size) distributed among workers, results are returned in input order,
+                       -1 to use all cpu
+
+    Returns:
+        np.array : flattened features, float32 array of shape (N x features), ready for scikit-learn
+    
+    """
+
+    # run batches in a process pool
+    if n_jobs == -1:
+        n_jobs = os.cpu_count()
+    chunk_size = max(1, min(batch_size, int(np.ceil(len(inputs) / max(1, n_jobs)))))
+    if n_jobs > 1 and len(inputs) > chunk_size:
+        chunks = [inputs[start:start+chunk_size] for start in range(0, len(inputs), chunk_size)]
+        executor = get_feature_pool(n_jobs)
+        features = list(executor.map(extract_features_batch, chunks, [J] * len(chunks), [Q] * len(chunks), [batch_size] * len(chunks)))
+        if len(set(x.shape[1] for x in features)) > 1:
+            raise ValueError("[!] Can't run batched scattering on waveforms of different length")
+        return np.concatenate(features)
+
+    # loop over batches
+    features = []
+    length = None
+    for start in range(0, len(inputs), batch_size):
+
+        # load waveforms
+        batch = []
+        for elt in inputs[start:start+batch_size]:
+            if isinstance(elt, str):
+                elt, sr = librosa.load(elt, sr=None)
+            batch.append(np.asarray(elt, dtype=np.float32))
+
+        # check length
+        for y in batch:
+            if length is None:
+                length = len(y)
+            if len(y) != length:
+                raise ValueError(f"[!] Can't run batched scattering on waveforms of different length ({len(y)} != {length})")
+
+        # Normalisation
+        y = np.stack(batch)
+        y = y / np.max(np.abs(y), axis=1, keepdims=True)
+
+        # Application du Scattering Transform
+        scattering = get_scattering(J, Q, length)
+        scattered_features = scattering(torch.from_numpy(y))
+        features.append(scattered_features.numpy().reshape(len(batch), -1))
+
+    # assemble
+    if len(features) == 0:
+        return np.empty((0, 0), dtype=np.float32)
+    return np.concatenate(features).astype(np.float32, copy=False)
+
+
 def display_features(audio_path:str, J:int, Q:int, output_file) -> None:
     """ Display features from audio file
 
@@ -1,13 +1,12 @@
 import pandas as pd
 import numpy as np
 from sklearn.manifold import MDS
-import mygene
 import craft_data
+import manage_stringdb
+import manage_identifiers
 import random
 import time
 
-from mygene import MyGeneInfo
-
 
 
 def get_proximity_from_data(data_file_list:list, matrix_save_file:str) -> None:
@@ -111,11 +110,9 @@ def reorder_cols_from_gmt(data_file, gmt_file, output_file):
     
     # build gene order
     gene_order = []
-    mg = mygene.MyGeneInfo()
+    ensembl_gene_sets = craft_data.entrez_sets_to_ensembl(gene_sets)
     for gene_set in gene_sets:
-        gene_list = gene_sets[gene_set]
-        ensembl_gene_list = craft_data.entrez_to_ensembl(gene_list) 
-        for g in ensembl_gene_list:
+        for g in ensembl_gene_sets[gene_set]:
             if g in present_gene_list and g not in gene_order:
                 gene_order.append(g)
 
@@ -139,7 +136,7 @@ def extract_order_from_graph_distances(distance_matrix_file:str) -> dict:
     """Compute gene order from proximity matrix builded from STringDB graph
 
     Args:
-        - distance_matrix_file (str) : path to the distance matric file
+        - distance_matrix_file (str) : path to the distance matric file, csv file or npy file (with its _nodes.txt file)
 
     Returns:
         - (dict) : gene to position
@@ -147,36 +144,50 @@ def extract_order_from_graph_distances(distance_matrix_file:str) -> dict:
     """
 
     # load distance matrix
-    dist_matrix = pd.read_csv(distance_matrix_file, index_col=0)
-
-    # find a linear order for genes
-    nodes = list(dist_matrix.index)
+    if distance_matrix_file.endswith(".npy"):
+        values = np.load(distance_matrix_file, mmap_mode='r')
+        nodes = open(distance_matrix_file.replace(".npy", "_nodes.txt")).read().splitlines()
+        columns = pd.Index(nodes)
+    else:
+        dist_matrix = pd.read_csv(distance_matrix_file, index_col=0)
+        nodes = list(dist_matrix.index)
+        values = dist_matrix.to_numpy(dtype=float)
+        columns = dist_matrix.columns
+
+    # find a linear order for genes, work on the underlying array, columns reordered as rows
     placed = {}
     
-    # 1. Trouver la paire la plus proche
-    min_dist = float("inf")
-    pair = None
-    for i in nodes:
-        for j in nodes:
-            if i != j and dist_matrix.loc[i, j] < min_dist:
-                min_dist = dist_matrix.loc[i, j]
-                pair = (i, j)
+    # 1. Trouver la paire la plus proche (first minimum in row-major order, self & missing distances ignored)
+    square = np.array(values[:, columns.get_indexer(nodes)], dtype=float)
+    square[np.isnan(square)] = np.inf
+    np.fill_diagonal(square, np.inf)
+    flat = int(np.argmin(square))
+    min_dist = square.flat[flat]
+    if np.isinf(min_dist):
+        raise ValueError(f"no finite distance between two distinct genes in {distance_matrix_file}")
     
-    a, b = pair
+    a, b = nodes[flat // len(nodes)], nodes[flat % len(nodes)]
     placed[a] = 0.0
     placed[b] = min_dist
-    used = {a, b}
+    used = np.zeros(len(columns), dtype=bool)
+    used[[columns.get_loc(a), columns.get_loc(b)]] = True
+    n_used = 2
+    row_of = {node:i for i, node in enumerate(nodes)}
     
     # 2. Construire l’ordre
     current = b
-    while len(used) < len(nodes):
-        # trouver le plus proche voisin de "current" qui n'est pas encore utilisé
-        dists = dist_matrix.loc[current].drop(labels=used)
-        next_gene = dists.idxmin()
-        next_dist = dists.min()
+    while n_used < len(nodes):
+        # trouver le plus proche voisin de "current" qui n'est pas encore utilisé (first unused column if all are unreachable)
+        candidates = np.flatnonzero(~used)
+        dists = np.array(values[row_of[current], candidates], dtype=float)
+        closest = int(np.nanargmin(dists))
+        k = candidates[closest]
+        next_gene = columns[k]
+        next_dist = dists[closest]
         
         placed[next_gene] = placed[current] + next_dist
-        used.add(next_gene)
+        used[k] = True
+        n_used += 1
         current = next_gene
     
     # 3. Retourner l’ordre trié par coordonnée
@@ -192,7 +203,29 @@ def extract_order_from_graph_distances(distance_matrix_file:str) -> dict:
 
 
 
-def extract_order_from_protein_distances(data_file:str, protein_link_file:str, protein_info_file:str, log_file:str, position_file:str):
+def build_sorted_adjacency(sources:np.array, targets:np.array, weights:np.array, n_nodes:int) -> tuple:
+    """Build a CSR like adjacency index from a list of edges, neighbours of each node are sorted by
+    increasing weight, ties keep the order of the edge list
+
+    Args:
+        - sources (np.array) : integer ids of edges sources
+        - targets (np.array) : integer ids of edges targets
+        - weights (np.array) : weights of edges
+        - n_nodes (int) : number of nodes
+
+    Returns:
+        - (np.array) : offsets, neighbours of node i are in [offsets[i], offsets[i+1])
+        - (np.array) : neighbours ids
+        - (np.array) : neighbours weights
+    
+    """
+    order = np.lexsort((np.arange(len(sources)), weights, sources))
+    offsets = np.zeros(n_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=n_nodes), out=offsets[1:])
+    return offsets, np.asarray(targets)[order], np.asarray(weights)[order]
+
+
+def extract_order_from_protein_distances(data_file:str, protein_link_file:str, protein_info_file:str, log_file:str, position_file:str) -> dict:
     """Extract gene order using proximiy between associated proteins, from a local data file.
 
     Args:
@@ -201,6 +234,9 @@ def extract_order_from_protein_distances(data_file:str, protein_link_file:str, p
         - protein_info_file (str) : path to ressource file downloaded from stringdb, used for ids converstion
         - log_file (str) : path to generated log file, contain list of ids that failed conversion
         - position_file (str) : path to generated position file, where results are saved 
+
+    Returns:
+        - (dict) : gene to position
        
     """
 
@@ -215,66 +251,69 @@ def extract_order_from_protein_distances(data_file:str, protein_link_file:str, p
     id_to_gene = {}
     df = pd.read_csv(protein_info_file, sep="\t")
     df = df[df['preferred_name'].isin(genes)]
-    for index, row in df.iterrows():
-        id_to_gene[row['#string_protein_id']] = row['preferred_name']
+    for protein_id, gene in zip(df['#string_protein_id'], df['preferred_name']):
+        id_to_gene[protein_id] = gene
 
     # check missing genes
+    found_genes = set(id_to_gene.values())
     log_data = open(log_file, "w")
     log_data.write("MISSING\n")
     for g in genes:
-        if g not in list(id_to_gene.values()):
+        if g not in found_genes:
             log_data.write(f"{g}\n")
     log_data.close()
 
-    # load and filter ressource file on genes
-    df = pd.read_csv(protein_link_file, sep=" ")
-    df = df[df['protein1'].isin(list(id_to_gene.keys()))]
-    df = df[df['protein2'].isin(list(id_to_gene.keys()))]
+    # load links between proteins of genes (binary store)
+    df = manage_stringdb.get_string_subnetwork(protein_link_file, list(id_to_gene))
+
+    # index links, neighbours of each protein sorted by decreasing score
+    protein_ids, proteins = pd.factorize(pd.concat([df['protein1'], df['protein2']]))
+    protein1 = protein_ids[:len(df)]
+    protein2 = protein_ids[len(df):]
+    scores = df['combined_score'].to_numpy()
+    offsets, neighbours, neighbour_scores = build_sorted_adjacency(protein1, protein2, -scores, len(proteins))
 
     # compute gene order
     id_to_pos = {}
     pos = 0
     
     # init - find the closes entry in the dataset
-    row_max = df.loc[df["combined_score"].idxmax()]
-    id_to_pos[row_max['protein1']] = pos
-    pos += float(1/row_max['combined_score'])
-    id_to_pos[row_max['protein2']] = pos
-    pivot = row_max['protein2']
-    root = row_max['protein1']
-    df = df[df['protein1']!=root]
-    df = df[df['protein2']!=root]
+    best = int(np.argmax(scores))
+    root = protein1[best]
+    pivot = protein2[best]
+    id_to_pos[proteins[root]] = pos
+    pos += float(1/scores[best])
+    id_to_pos[proteins[pivot]] = pos
+    removed = np.zeros(len(proteins), dtype=bool)
+    removed[root] = True
 
     # its been a while since i used one of these
     iteration = 0
     start = time.time()
-    while len(list(id_to_pos.keys())) < len(list(id_to_gene.keys())):
+    while len(id_to_pos) < len(id_to_gene):
 
-        # create sub df focus on pivot
-        df_sub = df[df['protein1']==pivot]
+        # find closest entry among neighbours of pivot that were not removed
+        candidates = np.arange(offsets[pivot], offsets[pivot + 1])
+        candidates = candidates[~removed[neighbours[candidates]]]
 
-        # check that there is something in the sub df
-        if df_sub.shape[0] > 0:
-
-            # find closest entry
-            row_max = df_sub.loc[df_sub["combined_score"].idxmax()]
+        # check that there is something left for pivot
+        if len(candidates) > 0:
 
             # assign pos to closes entry
-            pos += float(1/row_max['combined_score'])
-            id_to_pos[row_max['protein2']] = pos
+            closest = candidates[0]
+            pos += float(1/-neighbour_scores[closest])
+            id_to_pos[proteins[neighbours[closest]]] = pos
 
-            # update, closes entry become next pivot, remove old pivot from df
-            pivot = row_max['protein2']
-            root = row_max['protein1']
-            df = df[df['protein1']!=root]
-            df = df[df['protein2']!=root]
+            # update, closes entry become next pivot, remove old pivot
+            removed[pivot] = True
+            pivot = neighbours[closest]
 
             # display pregress
             iteration +=1
-            progress = (len(list(id_to_pos.keys())) / len(list(id_to_gene.keys()))) * 100.0
+            progress = (len(id_to_pos) / len(id_to_gene)) * 100.0
             current_time = time.time()
             duration = current_time - start
-            print(f"[ORDERING GENES][{iteration}][DURATION:{duration}] => {progress} ({len(list(id_to_pos.keys()))} / {len(list(id_to_gene.keys()))})")
+            print(f"[ORDERING GENES][{iteration}][DURATION:{duration}] => {progress} ({len(id_to_pos)} / {len(id_to_gene)})")
         else:
             print("[!]PREMATURE STOP")
             break
@@ -291,6 +330,8 @@ def extract_order_from_protein_distances(data_file:str, protein_link_file:str, p
     for i in id_to_pos:
         result_data.write(f"{i},{id_to_pos[i]}\n")
     result_data.close()
+
+    return id_to_pos
             
 
 def get_ensembl_genes(genes:list) -> dict:
@@ -304,41 +345,8 @@ def get_ensembl_genes(genes:list) -> dict:
     
     """
 
-    # init mygene object
-    mg = MyGeneInfo()
-    results = mg.querymany(
-        genes,
-        scopes="symbol",     # type d'input
-        fields="ensembl.gene",  # ce qu'on veut récupérer
-        species="human"      # Homo sapiens
-    )
-
-    # Convertir en DataFrame
-    df = pd.DataFrame(results)
-    df_simple = df[["query", "ensembl"]]
-
-    # Normaliser le champ "ensembl" (car parfois c'est une liste de dicts)
-    def extract_ensg(x):
-        if isinstance(x, list):
-            return [d["gene"] for d in x]  # plusieurs ENSG possibles
-        elif isinstance(x, dict):
-            return x.get("gene")
-        return None
-
-    # compute gene to ensembl
-    gene_to_ensembl = {}
-    df_simple["ENSG"] = df_simple["ensembl"].apply(extract_ensg)
-    for index, row in df_simple.iterrows():
-
-        k = row['query']
-        ensembl = row['ENSG']
-
-        if isinstance(ensembl, list):
-            gene_to_ensembl[k] = ensembl
-        elif ensembl:
-            gene_to_ensembl[k] = [ensembl]
-
-    return gene_to_ensembl
+    # look in local identifier database, fall back on mygene
+    return manage_identifiers.map_identifiers(genes, "symbol", "ensembl", use_mygene=True)
 
 
 def compute_gene_to_gene_distances(data_file:str, link_file:str, alias_file:str, output_file:str) -> None:
@@ -368,16 +376,11 @@ def compute_gene_to_gene_distances(data_file:str, link_file:str, alias_file:str,
                 id_to_symbol[i] = symbol
 
     # Mapp ENSG to ENSP
-    aliases = pd.read_csv(alias_file, sep="\t", skiprows=1, names=["protein", "alias", "source"])
-    links = pd.read_csv(link_file, sep=" ")
-    ensg_map = aliases[aliases["alias"].isin(ensg_list)][["alias", "protein"]]
+    ensg_map = manage_stringdb.filter_string_aliases(alias_file, ensg_list)[["alias", "protein"]]
 
     # extract score for all ENSP
     proteins = ensg_map["protein"].unique().tolist()
-    sub_links = links[
-        (links["protein1"].isin(proteins)) & 
-        (links["protein2"].isin(proteins))
-    ].copy()
+    sub_links = manage_stringdb.get_string_subnetwork(link_file, proteins)
 
     # add ENSG
     prot_to_ensg = dict(zip(ensg_map["protein"], ensg_map["alias"]))
@@ -405,14 +408,15 @@ def compute_gene_to_gene_distances(data_file:str, link_file:str, alias_file:str,
 
 
     
-def extract_order_from_gene_distances(data_file:str, gene_distance_file:str, position_file:str, log_file:str) -> dict:
+def extract_order_from_gene_distances(data_file:str, gene_distance_file:str, position_file:str, log_file:str, progress_step:int=1000) -> dict:
     """Extract gene order using proximiy between associated proteins, from a local data file.
 
     Args:
         - data_file (str) : path to input data file, should contain gene in 'preferred_name' format (e.g EGFR, IFN ...)
         - gene_distance_file (str) : file containing computed distances between genes
         - position_file (str) : path to generated position file, where results are saved 
-        - log_file (str) : path to log file, store unavailable genes
+        - log_file (str) : path to log file, store unavailable genes and ordering stats
+        - progress_step (int) : display progress every progress_step placed genes
 
     Returns:
         - (dict) : symbol to position
@@ -423,60 +427,73 @@ def extract_order_from_gene_distances(data_file:str, gene_distance_file:str, pos
     df = pd.read_csv(data_file)
     genes = list(df.keys())[1:-1]
 
-    # check genes available in distance file
+    # map symbols to integer ids
     df = pd.read_csv(gene_distance_file)
-    available_genes = []
-    for x in list(df['symbol1']):
-        if x not in available_genes:
-            available_genes.append(x)
-    for x in list(df['symbol2']):
-        if x not in available_genes:
-            available_genes.append(x)
+    symbol_ids, symbols = pd.factorize(pd.concat([df['symbol1'], df['symbol2']]))
+    symbol1 = symbol_ids[:len(df)]
+    symbol2 = symbol_ids[len(df):]
+    distances = df['distance'].to_numpy(dtype=float)
 
     # check available genes
+    available_genes = set(symbols)
     log_data = open(log_file, "w")
     for g in genes:
         if g not in available_genes:
             log_data.write(f"MISSING DISTANCE INFORMATION FOR GENE {g}\n")
-    log_data.close()
+
+    # index edges in both directions (interleaved to keep rows order), neighbours sorted by distance then by row in distance file
+    valid = ~np.isnan(distances)
+    offsets, neighbours, neighbour_distances = build_sorted_adjacency(
+        np.stack([symbol1[valid], symbol2[valid]], axis=1).ravel(),
+        np.stack([symbol2[valid], symbol1[valid]], axis=1).ravel(),
+        np.repeat(distances[valid], 2),
+        len(symbols)
+    )
 
     # Trouver la paire avec la distance minimale
-    idxmin = df["distance"].idxmin()
-    root = df.loc[idxmin, "symbol1"]
-    second = df.loc[idxmin, "symbol2"]
-    d_root_second = df.loc[idxmin, "distance"]
+    idxmin = int(np.nanargmin(distances))
+    root = symbol1[idxmin]
+    second = symbol2[idxmin]
 
     # Positions initiales
-    positions = {root: 0, second: d_root_second}
-    visited = {root, second}
+    positions = {symbols[root]: 0, symbols[second]: distances[idxmin]}
+    visited = np.zeros(len(symbols), dtype=bool)
+    visited[[root, second]] = True
+    n_visited = int(visited.sum())
     current = second
 
     # Boucle jusqu'à visiter tous les gènes
-    while len(visited) < len(set(df["symbol1"]) | set(df["symbol2"])):
-        # Trouver la plus petite distance depuis le "current" vers un gène non visité
-        candidates = df[
-            ((df["symbol1"] == current) & (~df["symbol2"].isin(visited)))
-            | ((df["symbol2"] == current) & (~df["symbol1"].isin(visited)))
-        ]
+    iteration = 0
+    start = time.time()
+    while n_visited < len(symbols):
 
-        if candidates.empty:
+        # Trouver la plus petite distance depuis le "current" vers un gène non visité
+        candidates = np.arange(offsets[current], offsets[current + 1])
+        candidates = candidates[~visited[neighbours[candidates]]]
+        if len(candidates) == 0:
             break  # bloqué (graphe non connexe)
-
-        next_idx = candidates["distance"].idxmin()
-        row = candidates.loc[next_idx]
-
-        if row["symbol1"] == current:
-            nxt = row["symbol2"]
-        else:
-            nxt = row["symbol1"]
+        closest = candidates[0]
+        nxt = neighbours[closest]
 
         # Position = position du current + distance
-        positions[nxt] = positions[current] + row["distance"]
+        positions[symbols[nxt]] = positions[symbols[current]] + neighbour_distances[closest]
 
         # Avancer
-        visited.add(nxt)
+        visited[nxt] = True
+        n_visited += 1
         current = nxt
 
+        # display progress
+        iteration += 1
+        if iteration % progress_step == 0:
+            duration = time.time() - start
+            print(f"[ORDERING GENES][{iteration}][DURATION:{duration}] => {n_visited / len(symbols) * 100.0} ({n_visited} / {len(symbols)}) - {iteration / max(duration, 1e-9)} genes/s")
+
+    # log ordering stats
+    duration = time.time() - start
+    log_data.write(f"PLACED {n_visited} / {len(symbols)} GENES IN {duration} s ({iteration / max(duration, 1e-9)} genes/s)\n")
+    log_data.close()
+
     # save data
     data = []
     for symbol in positions:
@@ -6,11 +6,11 @@ import pandas as pd
 
 
 # import local module
-import extract_features
+import manage_feature_store
 
 
 
-def run_kmeans(file_list:list, J:int, Q:int, result_file:str, audio_duration:float, k:int) -> None:
+def run_kmeans(file_list:list, J:int, Q:int, result_file:str, audio_duration:float, k:int, feature_store:str=None, n_jobs:int=1) -> None:
     """Run kmeans clustering on audio file
     
     Args:
@@ -20,15 +20,13 @@ def run_kmeans(file_list:list, J:int, Q:int, result_file:str, audio_duration:flo
         - result_save (str) : path to the file for saving results
         - audio_duration (float) : duration of the audio samples (seconds)
         - k (int) : number of cluster to hunt
+        - feature_store (str) : path to a feature store folder, if set features are pulled from it instead of recomputed
+        - n_jobs (int) : number of worker processes used for feature extraction
     
     """
 
     # load data
-    X = []
-    for fl in file_list:
-        x = extract_features.extract_features(fl, J, Q)
-        features = x.numpy().flatten()
-        X.append(features)
+    X = manage_feature_store.extract_features_with_store(file_list, J, Q, audio_duration, feature_store, n_jobs=n_jobs)
 
     # run kmeans
     kmeans = KMeans(n_clusters=k, random_state=42, n_init="auto")
@@ -5,6 +5,9 @@ import requests
 import gzip
 import shutil
 
+# local importation
+import manage_stringdb
+
 
 def get_data_from_kaggle():
     """Download a real dataset directly from kaggle"""
@@ -93,6 +96,10 @@ def get_data_from_stringdb(link_save_path:str, info_save_path:str, map_save_path
             shutil.copyfileobj(f_in, f_out)
     os.remove(map_tmp_path)
 
+    # convert links & aliases into binary stores, reused by gene ordering functions
+    manage_stringdb.convert_string_links(link_save_path)
+    manage_stringdb.convert_string_aliases(map_save_path)
+
     
 if __name__ == "__main__":
 
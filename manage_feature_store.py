@@ -0,0 +1,198 @@
+import os
+import glob
+import hashlib
+import numpy as np
+
+# local importation
+import extract_features
+
+
+# bump when the way features are computed changes, invalidate all stored features
+STORE_VERSION = 1
+STORE_MAX_SIZE_MB = 2048
+
+
+def compute_feature_key(waveform, J:int, Q:int, audio_duration:float) -> str:
+    """Compute the key of a feature vector in the store, i.e a hash of the waveform bytes and of
+    the scattering parameters
+
+    Args:
+        - waveform (str or np.array) : path to an audio file (raw file bytes are hashed) or waveform
+        - J (int) : scat features parameters 1
+        - Q (int) : scat features parameters 2
+        - audio_duration (float) : duration of the audio samples (seconds)
+
+    Returns:
+        - (str) : key
+
+    """
+
+    # hash waveform
+    h = hashlib.sha1()
+    if isinstance(waveform, str):
+        with open(waveform, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+    else:
+        h.update(np.ascontiguousarray(waveform, dtype=np.float32).tobytes())
+
+    # hash parameters
+    h.update(f"v={STORE_VERSION};J={J};Q={Q};duration={audio_duration}".encode())
+
+    return h.hexdigest()
+
+
+def load_features(store_folder:str, key:str, expected_length:int=None):
+    """Load a feature vector from the store (copied in memory, vectors are small and no file handle is kept open),
+    drop the entry if it is corrupted or if it does not have the expected length
+
+    Args:
+        - store_folder (str) : path to the feature store folder
+        - key (str) : key of the feature vector
+        - expected_length (int) : expected number of features, not checked if None
+
+    Returns:
+        - (np.array) : features, None if not in store or invalid
+
+    """
+
+    # check file
+    feature_file = f"{store_folder}/{key}.npy"
+    if not os.path.isfile(feature_file):
+        return None
+
+    # load & validate
+    try:
+        features = np.load(feature_file)
+        if features.dtype != np.float32 or features.ndim != 1:
+            raise ValueError(f"unexpected features {features.dtype} {features.shape}")
+        if expected_length is not None and features.shape[0] != expected_length:
+            raise ValueError(f"unexpected length {features.shape[0]} != {expected_length}")
+    except Exception as e:
+        print(f"[FEATURE-STORE][!] Drop invalid entry {key} : {e}")
+        os.remove(feature_file)
+        return None
+
+    # refresh access time for eviction
+    os.utime(feature_file)
+
+    return features
+
+
+def save_features(store_folder:str, key:str, features:np.array) -> None:
+    """Save a feature vector in the store, write in a temporary file first (unique to the process, so
+    that concurrent runs sharing the store never write the same file) so a crash never leaves a truncated entry
+
+    Args:
+        - store_folder (str) : path to the feature store folder
+        - key (str) : key of the feature vector
+        - features (np.array) : feature vector
+
+    """
+    tmp_file = f"{store_folder}/{key}.npy.{os.getpid()}.tmp"
+    with open(tmp_file, "wb") as f:
+        np.save(f, np.asarray(features, dtype=np.float32))
+    os.replace(tmp_file, f"{store_folder}/{key}.npy")
+
+
+def evict_features(store_folder:str, max_size_mb:float) -> int:
+    """Remove least recently used entries until the store fits in max_size_mb
+
+    Args:
+        - store_folder (str) : path to the feature store folder
+        - max_size_mb (float) : maximum size of the store (MB)
+
+    Returns:
+        - (int) : number of evicted entries
+
+    """
+
+    # scan store
+    entries = []
+    total_size = 0
+    for feature_file in glob.glob(f"{store_folder}/*.npy"):
+        stat = os.stat(feature_file)
+        entries.append((stat.st_mtime, stat.st_size, feature_file))
+        total_size += stat.st_size
+
+    # remove oldest entries
+    n_evicted = 0
+    max_size = max_size_mb * 1024 * 1024
+    for mtime, size, feature_file in sorted(entries):
+        if total_size <= max_size:
+            break
+        os.remove(feature_file)
+        total_size -= size
+        n_evicted += 1
+
+    return n_evicted
+
+
+def compute_missing_features(inputs:list, indexes:list, keys:list, features:list, J:int, Q:int, store_folder:str, batch_size:int=32, n_jobs:int=1) -> None:
+    """Compute features of the inputs at the given indexes, save them in the store and fill the features list (in place)
+
+    Args:
+        - inputs (list) : list of path to audio files or of waveforms
+        - indexes (list) : indexes of the inputs to compute
+        - keys (list) : keys of all inputs
+        - features (list) : features of all inputs, updated in place
+        - J (int) : scat features parameters 1
+        - Q (int) : scat features parameters 2
+        - store_folder (str) : path to the feature store folder
+        - batch_size (int) : number of waveforms transformed together
+        - n_jobs (int) : number of worker processes
+
+    """
+    computed = extract_features.extract_features_batch([inputs[i] for i in indexes], J, Q, batch_size, n_jobs)
+    for i, x in zip(indexes, computed):
+        save_features(store_folder, keys[i], x)
+        features[i] = x
+
+
+def extract_features_with_store(inputs:list, J:int, Q:int, audio_duration:float, store_folder:str, batch_size:int=32, max_size_mb:float=STORE_MAX_SIZE_MB, n_jobs:int=1) -> np.array:
+    """Same as extract_features.extract_features_batch but pull features from the store when they were
+    already computed, only missing features are computed (and then saved in the store)
+
+    Args:
+        - inputs (list) : list of path to audio files or of waveforms
+        - J (int) : scat features parameters 1
+        - Q (int) : scat features parameters 2
+        - audio_duration (float) : duration of the audio samples (seconds)
+        - store_folder (str) : path to the feature store folder, if None the store is not used
+        - batch_size (int) : number of waveforms transformed together
+        - max_size_mb (float) : maximum size of the store (MB)
+        - n_jobs (int) : number of worker processes used to compute missing features
+
+    Returns:
+        - (np.array) : flattened features, float32 array of shape (N x features)
+
+    """
+
+    # no store
+    if store_folder is None or len(inputs) == 0:
+        return extract_features.extract_features_batch(inputs, J, Q, batch_size, n_jobs)
+    os.makedirs(store_folder, exist_ok=True)
+
+    # look for features in store
+    keys = [compute_feature_key(elt, J, Q, audio_duration) for elt in inputs]
+    features = [load_features(store_folder, key) for key in keys]
+    missing = [i for i in range(len(inputs)) if features[i] is None]
+    print(f"[FEATURE-STORE] {len(inputs) - len(missing)} hits / {len(missing)} misses")
+
+    # compute & save missing features
+    if len(missing) > 0:
+        compute_missing_features(inputs, missing, keys, features, J, Q, store_folder, batch_size, n_jobs)
+
+    # stored entries must have the length of the computed features (or the most common length if everything
+    # was in store), drop & recompute the others
+    lengths = [len(x) for x in features]
+    expected_length = lengths[missing[0]] if len(missing) > 0 else max(set(lengths), key=lengths.count)
+    invalid = [i for i in range(len(inputs)) if lengths[i] != expected_length and load_features(store_folder, keys[i], expected_length) is None]
+    if len(invalid) > 0:
+        compute_missing_features(inputs, invalid, keys, features, J, Q, store_folder, batch_size, n_jobs)
+
+    # keep store size under control
+    if len(missing) > 0 or len(invalid) > 0:
+        evict_features(store_folder, max_size_mb)
+
+    return np.stack(features).astype(np.float32, copy=False)
@@ -1,15 +1,53 @@
 import pickle
+import multiprocessing
+import numpy as np
 import pandas as pd
 import networkx as nx
+from concurrent.futures import ProcessPoolExecutor
+from scipy.sparse.csgraph import dijkstra
 
+# graph of the current worker process, set by init_distance_worker
+WORKER_GRAPH = None
 
-def compute_graph_distance(graph_file_name:str, matrix_file_name:str):
-    """Generate distance matrix of nodes within a stringdb graph
+
+def init_distance_worker(graph, directed:bool) -> None:
+    """Initialize a worker process for distance computation, keep the sparse graph in memory
+
+    Args:
+        - graph (scipy.sparse.csr_array) : sparse cost matrix of the graph
+        - directed (bool) : True if the graph is directed
+
+    """
+    global WORKER_GRAPH
+    WORKER_GRAPH = (graph, directed)
+
+
+def compute_source_distances(sources:np.array) -> np.array:
+    """Compute shortest path distances from a chunk of source nodes, run in a worker process
+
+    Args:
+        - sources (np.array) : indices of source nodes
+
+    Returns:
+        - (np.array) : distances, array of shape (sources x nodes)
+
+    """
+    graph, directed = WORKER_GRAPH
+    return dijkstra(graph, directed=directed, indices=sources)
+
+
+def compute_graph_distance(graph_file_name:str, matrix_file_name:str, unreachable_value:float=None, n_jobs:int=1, chunk_size:int=256) -> None:
+    """Generate distance matrix of nodes within a stringdb graph. If matrix_file_name ends with .npy
+    the matrix is written as a float32 array (memory-mapped, no dense copy in memory) and the nodes
+    are saved in a _nodes.txt file next to it, else it is saved as a csv file
 
     Args:
         - graph_file_name (str) : path to pickle file to load the graph
-        - matrix_file_name (str) : path to matrix file to save the distances
-    
+        - matrix_file_name (str) : path to matrix file to save the distances (.npy or .csv)
+        - unreachable_value (float) : distance used for pairs of nodes without path, if None use twice the largest distance
+        - n_jobs (int) : number of worker processes, sources nodes are split between workers (-1 to use all cpu)
+        - chunk_size (int) : number of source nodes processed together
+
     """
 
     # load graph
@@ -18,23 +56,54 @@ def compute_graph_distance(graph_file_name:str, matrix_file_name:str):
     # 1. Transformer les poids STRING en coût (plus le score est grand, plus le coût est petit)
     for u, v, data in G.edges(data=True):
         data['cost'] = 1.0 / data['weight']
+    nodes = list(G.nodes())
+    graph = nx.to_scipy_sparse_array(G, nodelist=nodes, weight="cost", format="csr")
+    directed = G.is_directed()
 
-    # 2. Calculer toutes les distances pondérées (weighted shortest path)
-    distances = dict(nx.all_pairs_dijkstra_path_length(G, weight="cost"))
+    # 2. Init matrix, memory-mapped float32 array for npy files
+    if matrix_file_name.endswith(".npy"):
+        dist_matrix = np.lib.format.open_memmap(matrix_file_name, mode="w+", dtype=np.float32, shape=(len(nodes), len(nodes)))
+    else:
+        dist_matrix = np.empty((len(nodes), len(nodes)), dtype=float)
 
-    # 3. Convertir en DataFrame (matrice de distances)
-    nodes = list(G.nodes())
-    dist_matrix = pd.DataFrame(index=nodes, columns=nodes, dtype=float)
-    for i in nodes:
-        for j in nodes:
-            dist_matrix.loc[i, j] = distances[i].get(j, float("inf"))  # inf si pas de chemin
+    # 3. Calculer toutes les distances pondérées (weighted shortest path), by chunks of source nodes
+    chunks = [np.arange(i, min(i + chunk_size, len(nodes))) for i in range(0, len(nodes), chunk_size)]
+    if n_jobs == -1:
+        n_jobs = multiprocessing.cpu_count()
+    if n_jobs > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=min(n_jobs, len(chunks)), mp_context=multiprocessing.get_context("spawn"), initializer=init_distance_worker, initargs=(graph, directed)) as executor:
+            for sources, distances in zip(chunks, executor.map(compute_source_distances, chunks)):
+                dist_matrix[sources] = distances
+    else:
+        for sources in chunks:
+            dist_matrix[sources] = dijkstra(graph, directed=directed, indices=sources)
 
-    # 4. Sauvegarde CSV
-    dist_matrix.to_csv(matrix_file_name)
+    # 4. Remplacer les distances infinies (pas de chemin)
+    if unreachable_value is None:
+        max_distance = 0.0
+        for sources in chunks:
+            distances = dist_matrix[sources]
+            finite = distances[np.isfinite(distances)]
+            if len(finite) > 0:
+                max_distance = max(max_distance, float(finite.max()))
+        unreachable_value = 2 * max_distance if max_distance > 0 else 1.0
+    for sources in chunks:
+        distances = dist_matrix[sources]
+        distances[np.isinf(distances)] = unreachable_value
+        dist_matrix[sources] = distances
+
+    # 5. Sauvegarde
+    if matrix_file_name.endswith(".npy"):
+        dist_matrix.flush()
+        with open(matrix_file_name.replace(".npy", "_nodes.txt"), "w") as f:
+            for node in nodes:
+                f.write(f"{node}\n")
+    else:
+        pd.DataFrame(dist_matrix, index=nodes, columns=nodes).to_csv(matrix_file_name)
 
 
 if __name__ == "__main__":
 
     compute_graph_distance("/tmp/string_network.pickle", "/tmp/dist.csv")
 
-    
+
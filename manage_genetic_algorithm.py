@@ -1,9 +1,17 @@
 import pandas as pd
+import numpy as np
 import random
 import shutil
 import os
 import glob
 import yaml
+import pickle
+import hashlib
+import time
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from scipy.stats import spearmanr
 
 # local importation
 import build_signal
@@ -11,41 +19,44 @@ import extract_features
 import simple_clf
 
 
-def generate_individual(genes:list, possible_positions:list) -> dict:
-    """Create one random individual
+# evaluation context and fitness cache loaded by each fitness evaluation worker
+WORKER_CONTEXT = None
+WORKER_CACHE = None
+
+
+def generate_population(size:int, n_genes:int, rng:np.random.Generator) -> np.array:
+    """Generate a population of random individuals. An individual is a permutation of positions,
+    value at index i is the position of the i-th gene
 
     Args:
-        - genes (list) : list of genes extracted from data file
-        - possible_poistions (list) : list of possible positions to adopt
+        - size (int) : n individual in pop
+        - n_genes (int) : number of genes, i.e of possible positions
+        - rng (np.random.Generator) : random generator
 
     Returns:
-        - (dict) : gene to position
+        - (np.array) : population, integer array of shape (size x n_genes)
     
     """
-    # randomize position order
-    random.shuffle(possible_positions)
+    return np.argsort(rng.random((size, n_genes)), axis=1)
+
 
-    # craft and return individual
-    return {gene: pos for gene, pos in zip(genes, possible_positions)}
+def permutation_to_individual(permutation:np.array, genes:list) -> dict:
+    """Convert a permutation (row of a population) into a gene to position dict"""
+    return {gene: int(pos) for gene, pos in zip(genes, permutation)}
 
-def generate_population(size:int, genes:list, possible_positions:list) -> list:
-    """Generate a list of individual
+
+def load_evaluation_context(configuration_file:str) -> dict:
+    """Parse configuration and load dataset once for a whole GA run, expression matrix is kept as
+    a numpy array with precomputed row indexes for each group
 
     Args:
-        - size (int) : n individual in pop
-        - genes (list) : list of genes extracted from data file
-        - possible_poistions (list) : list of possible positions to adopt
+        - configuration_file (str) : path to the configuration file
 
     Returns:
-        - (list) : list of individuals, i.e a population
+        - (dict) : evaluation context, with keys 'config', 'config_hash', 'genes', 'gene_index' (gene to column),
+                   'ids', 'data' (patients x genes array), 'label_list' and 'label_to_index' (label to row indexes)
     
     """
-    return [generate_individual(genes, possible_positions) for _ in range(size)]
-
-
-
-def fitness(gene_to_pos, result_folder, configuration_file):
-    """compute fitness for a given individual (gene_to_pos), in this case use auc from log classification"""
 
     # load configuration
     with open(configuration_file, "r") as f:
@@ -53,51 +64,95 @@ def fitness(gene_to_pos, result_folder, configuration_file):
 
     # load data
     df = pd.read_csv(config['data_file'])
+    genes = [k for k in df.keys() if k not in ['ID', 'GROUP', 'LABEL']]
 
-    #--------------#
-    # Prepare Data #
-    #--------------#
-
-    # clean result folder
-    if os.path.isdir(result_folder):
-        shutil.rmtree(result_folder)
-    os.mkdir(result_folder)
-        
-    # cleaning data
-    var_to_keep = ['ID']
+    # extract labels
     label_list = []
-    for elt in gene_to_pos.keys():
-        var_to_keep.append(elt)
     for label in df['GROUP']:
         if label not in label_list:
             label_list.append(label)
-    for label in label_list:
-        df_grp = df[df['GROUP'] == label]
-        df_grp = df_grp[var_to_keep]
-        df_grp.to_csv(f"{result_folder}/data_group_{label}.csv", index=False)
-
-    # build signal
-    for label in label_list:
-        build_signal.build_signal_from_computed_positions(
-                                                          f"{result_folder}/data_group_{label}.csv",
-                                                          f"{result_folder}/group_{label}",
-                                                          gene_to_pos
-                                                      )
-
-    # turn into audio files
-    for label in label_list:
-        for signal_file in glob.glob(f"{result_folder}/group_{label}/*.csv"):
-            build_signal.turn_signal_into_audio(signal_file, config['audio_duration'])
+    groups = df['GROUP'].to_numpy()
+
+    return {
+        "config":config,
+        "config_hash":compute_config_hash(configuration_file),
+        "genes":genes,
+        "gene_index":{gene: i for i, gene in enumerate(genes)},
+        "ids":df['ID'].to_numpy(),
+        "data":df[genes].to_numpy(dtype=float),
+        "label_list":label_list,
+        "label_to_index":{label: np.flatnonzero(groups == label) for label in label_list}
+    }
+
+
+def build_signal_matrices(gene_to_pos:dict, context:dict) -> dict:
+    """Build the signal matrix of each group for an individual, i.e permute the columns of the
+    expression matrix held by the evaluation context
+
+    Args:
+        - gene_to_pos (dict) : gene to position
+        - context (dict) : evaluation context, as returned by load_evaluation_context
+
+    Returns:
+        - (dict) : label to signal matrix (see build_signal.build_signal_matrix)
     
-    # prepare data for classification
+    """
+    cols = [context['gene_index'][gene] for gene in gene_to_pos]
+    x = np.array(list(gene_to_pos.values()), dtype=float)
+    label_to_signal_matrix = {}
+    for label in context['label_list']:
+        rows = context['label_to_index'][label]
+        label_to_signal_matrix[label] = {
+            "ids":context['ids'][rows],
+            "genes":list(gene_to_pos.keys()),
+            "x":x,
+            "y":context['data'][np.ix_(rows, cols)]
+        }
+    return label_to_signal_matrix
+
+
+def fitness(gene_to_pos, result_folder, configuration_file, context:dict=None):
+    """compute fitness for a given individual (gene_to_pos), in this case use auc from log classification.
+    If save_artifacts is set to false in the configuration, nothing is written in result_folder and the
+    whole signal -> audio -> features path runs in memory. Configuration and data are taken from context
+    (see load_evaluation_context) if provided, else loaded from configuration_file"""
+
+    # load configuration & data
+    if context is None:
+        context = load_evaluation_context(configuration_file)
+    config = context['config']
+    label_list = context['label_list']
+    save_artifacts = config.get('save_artifacts', True)
+
+    #--------------#
+    # Prepare Data #
+    #--------------#
+
+    # build signal in memory, i.e permute columns
+    label_to_signal_matrix = build_signal_matrices(gene_to_pos, context)
+
+    # write signal, audio files and samples
     label_to_audio_list = {}
-    for label in label_list:
-        label_to_audio_list[label] = glob.glob(f"{result_folder}/group_{label}/*.wav")
+    if save_artifacts:
+
+        # clean result folder
+        if os.path.isdir(result_folder):
+            shutil.rmtree(result_folder)
+        os.mkdir(result_folder)
+
+        # save signal & turn into audio files
+        for label in label_list:
+            build_signal.save_signal_matrix(label_to_signal_matrix[label], f"{result_folder}/group_{label}")
+            build_signal.turn_signal_matrix_into_audio(label_to_signal_matrix[label], f"{result_folder}/group_{label}", config['audio_duration'])
+    
+        # prepare data for classification
+        for label in label_list:
+            label_to_audio_list[label] = glob.glob(f"{result_folder}/group_{label}/*.wav")
 
-    # take samples
-    for label in label_list:
-        audio_file = label_to_audio_list[label][random.randint(0, len(label_to_audio_list[label])-1)]
-        extract_features.display_features(audio_file, config['J'], config['Q'], f"{result_folder}/signal_sample_group_{label}.png")        
+        # take samples
+        for label in label_list:
+            audio_file = label_to_audio_list[label][random.randint(0, len(label_to_audio_list[label])-1)]
+            extract_features.display_features(audio_file, config['J'], config['Q'], f"{result_folder}/signal_sample_group_{label}.png")        
 
     # ---------------#
     # Run Classifier #
@@ -106,7 +161,7 @@ def fitness(gene_to_pos, result_folder, configuration_file):
     # deal with binary log
     auc = 0
     if config['classifier'] == 'log':
-        if len(label_list) == 2:
+        if len(label_list) == 2 and save_artifacts:
             auc = simple_clf.run_log_clf(
                     label_to_audio_list[label_list[0]],
                     label_to_audio_list[label_list[1]],
@@ -115,182 +170,978 @@ def fitness(gene_to_pos, result_folder, configuration_file):
                     f"{result_folder}/results.csv",
                     config['audio_duration']
             )
+        elif len(label_list) == 2:
+            auc = simple_clf.run_log_clf_from_signals(
+                    label_to_signal_matrix[label_list[0]],
+                    label_to_signal_matrix[label_list[1]],
+                    config['J'],
+                    config['Q'],
+                    None,
+                    config['audio_duration']
+            )
         else:
             print("[!] Can't run binary claffication with n labels != 2")
 
     return auc
 
 
-def selection(population:list, result_folder:str, configuration_file:str) -> dict:
-    """Sélection (tournoi à 2)
-    For some reason classifier sometime crash because of nan in data, if its the case fitness score is
-    condisedered 0
+def surrogate_fitness_batch(individuals:list, context:dict=None) -> list:
+    """Cheap proxy of fitness used to pre-screen individuals : same log classification but on low
+    resolution waveforms (surrogate_sample_rate, default 2048 Hz) with a small number of scales
+    (surrogate_J, default 2). Waveforms of all individuals go through a single batched feature
+    extraction. Crashes are considered as a 0 score, like for fitness. If no context is provided,
+    use the context loaded by the worker (if any)
+
+    Args:
+        - individuals (list) : list of individuals (gene to position)
+        - context (dict) : evaluation context, as returned by load_evaluation_context, can be None
+
+    Returns:
+        - (list) : surrogate aucs, in the same order as individuals
     
     """
-    
-    # pick random candidates
-    a, b = random.sample(population, 2)
 
-    # compute score a
-    score_a = 0
+    # params
+    if context is None:
+        context = WORKER_CONTEXT
+    config = context['config']
+    label_list = context['label_list']
+    sample_rate = config.get('surrogate_sample_rate', 2048)
+    J = config.get('surrogate_J', 2)
+    scores = [0] * len(individuals)
+    if config['classifier'] != 'log' or len(label_list) != 2:
+        return scores
+
+    # low resolution waveforms of every individual
+    rendered = []
+    for i, gene_to_pos in enumerate(individuals):
+        try:
+            label_to_signal_matrix = build_signal_matrices(gene_to_pos, context)
+            rendered.append((i, [build_signal.synthesize_waveforms(label_to_signal_matrix[label]['y'], label_to_signal_matrix[label]['x'], config['audio_duration'], sample_rate) for label in label_list]))
+        except:
+            pass
+
+    # batched features -> auc of each individual
     try:
-        score_a = fitness(a, result_folder, configuration_file)
+        X = extract_features.extract_features_batch(np.concatenate([w for i, waveforms in rendered for w in waveforms]), J, config['Q'])
     except:
-        pass
+        return scores
+    start = 0
+    for i, waveforms in rendered:
+        n_a, n_b = len(waveforms[0]), len(waveforms[1])
+        try:
+            y = ["class_a"] * n_a + ["class_b"] * n_b
+            scores[i] = simple_clf.train_log_clf(X[start:start + n_a + n_b], y, J, config['Q'], None, config['audio_duration'])
+        except:
+            pass
+        start += n_a + n_b
+
+    return scores
+
+
+def surrogate_fitness(gene_to_pos:dict, context:dict) -> float:
+    """Surrogate fitness of a single individual, see surrogate_fitness_batch"""
+    return surrogate_fitness_batch([gene_to_pos], context)[0]
+
+
+def evaluate_with_surrogate(population:np.array, genes:list, result_folder:str, configuration_file:str, executor:ProcessPoolExecutor, cache:dict, context:dict, rng:np.random.Generator) -> tuple:
+    """Rank a population with the surrogate fitness and promote only the top surrogate_fraction
+    (default 0.2) of individuals to the full fitness evaluation. The surrogate runs on the evaluation
+    pool (if any), by chunks of surrogate_batch_size (default 8) individuals. An audit sample of surrogate_audit_size
+    individuals (default 10% of the population, at least 3), one drawn at random in each slice of the
+    surrogate ranking, is also fully evaluated to measure how much the surrogate can be trusted
 
-    # compute score a
-    score_b = 0
+    Args:
+        - population (np.array) : population, integer array of shape (size x n_genes)
+        - genes (list) : list of genes, in population columns order
+        - result_folder (str) : path to the scratch folder
+        - configuration_file (str) : path to the configuration file
+        - executor (ProcessPoolExecutor) : evaluation pool used for the surrogate & full evaluations, None to run serially
+        - cache (dict) : fitness cache, can be None
+        - context (dict) : evaluation context
+        - rng (np.random.Generator) : random generator, used to draw the audit sample
+
+    Returns:
+        - (tuple) : scores (full fitness, nan for individuals not fully evaluated), surrogate scores,
+                    indexes of fully evaluated individuals and spearman correlation between surrogate and
+                    full fitness on the audit sample
+    
+    """
+
+    # score with surrogate, by chunks of individuals
+    config = context['config']
+    individuals = [permutation_to_individual(permutation, genes) for permutation in population]
+    chunk_size = config.get('surrogate_batch_size', 8)
+    chunks = [individuals[start:start+chunk_size] for start in range(0, len(individuals), chunk_size)]
+    if executor is None:
+        results = [surrogate_fitness_batch(chunk, context) for chunk in chunks]
+    else:
+        results = list(executor.map(surrogate_fitness_batch, chunks))
+    surrogate_scores = np.array([score for result in results for score in result], dtype=float)
+
+    # rank with surrogate
+    ranking = np.argsort(-surrogate_scores, kind='stable')
+    n_promoted = max(1, int(np.ceil(config.get('surrogate_fraction', 0.2) * len(population))))
+    promoted = ranking[:n_promoted]
+
+    # draw audit sample across the whole ranking
+    n_audit = min(len(population), config.get('surrogate_audit_size', max(3, int(np.ceil(0.1 * len(population))))))
+    audit = np.array([rng.choice(chunk) for chunk in np.array_split(ranking, n_audit)], dtype=int)
+
+    # full evaluation of promoted & audited individuals
+    evaluated = np.union1d(promoted, audit)
+    scores = np.full(len(population), np.nan)
+    scores[evaluated] = evaluate_permutations(population[evaluated], genes, result_folder, configuration_file, executor, cache, context)
+
+    # check how much we can trust the surrogate
+    correlation = float("nan")
+    if n_audit > 2:
+        correlation = spearmanr(surrogate_scores[audit], scores[audit]).correlation
+
+    return (scores, surrogate_scores, evaluated, correlation)
+
+
+def compute_config_hash(configuration_file:str) -> str:
+    """Hash the content of the configuration file, used to make sure cached fitness were computed
+    with the same parameters"""
+    with open(configuration_file, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def individual_key(gene_to_pos:dict, config_hash:str) -> str:
+    """Canonical encoding of an individual, i.e positions listed in gene name order, plus configuration hash"""
+    encoding = ";".join(f"{gene}:{gene_to_pos[gene]}" for gene in sorted(gene_to_pos))
+    return hashlib.sha1(f"{config_hash}|{encoding}".encode()).hexdigest()
+
+
+def init_fitness_cache(max_size:int=10000, cache_file:str=None) -> dict:
+    """Create a LRU fitness cache, reload previous entries from cache_file if it exists
+
+    Args:
+        - max_size (int) : max number of individuals kept in cache
+        - cache_file (str) : path to a pickle file used to persist the cache across runs, can be None
+
+    Returns:
+        - (dict) : fitness cache
+    
+    """
+
+    # init cache
+    cache = {"entries":OrderedDict(), "max_size":max_size, "cache_file":cache_file, "hits":0, "misses":0}
+
+    # reload from disk
+    if cache_file and os.path.isfile(cache_file):
+        with open(cache_file, "rb") as f:
+            cache["entries"].update(pickle.load(f))
+        while len(cache["entries"]) > max_size:
+            cache["entries"].popitem(last=False)
+
+    return cache
+
+
+def save_fitness_cache(cache:dict) -> None:
+    """Save fitness cache entries in its cache file (if any), write a temporary file first"""
+    if cache["cache_file"]:
+        with open(f"{cache['cache_file']}.tmp", "wb") as f:
+            pickle.dump(cache["entries"], f)
+        os.replace(f"{cache['cache_file']}.tmp", cache["cache_file"])
+
+
+def init_evaluation_worker(n_threads:int, configuration_file:str) -> None:
+    """Initialize a fitness evaluation worker : pin torch threads and load the evaluation context once"""
+    global WORKER_CONTEXT
+    extract_features.init_feature_worker(n_threads)
+    WORKER_CONTEXT = load_evaluation_context(configuration_file)
+
+
+def create_evaluation_pool(n_jobs:int, configuration_file:str) -> ProcessPoolExecutor:
+    """Create the process pool used to evaluate individuals, workers pin torch threads and load the
+    evaluation context once. The pool is meant to be created once per run and reused every generation
+
+    Args:
+        - n_jobs (int) : number of worker processes, -1 to use all cpu
+        - configuration_file (str) : path to the configuration file
+
+    Returns:
+        - (ProcessPoolExecutor) : evaluation pool, None if n_jobs <= 1 (serial run)
+    
+    """
+    if n_jobs == -1:
+        n_jobs = os.cpu_count()
+    if n_jobs <= 1:
+        return None
+    n_threads = max(1, os.cpu_count() // n_jobs)
+    return ProcessPoolExecutor(max_workers=n_jobs, mp_context=multiprocessing.get_context("spawn"), initializer=init_evaluation_worker, initargs=(n_threads, configuration_file))
+
+
+def safe_fitness(gene_to_pos, result_folder, configuration_file, isolate:bool=False, context:dict=None) -> float:
+    """Compute fitness, for some reason classifier sometime crash because of nan in data, if its the case fitness score is
+    condisedered 0. If isolate is set to True, use a scratch folder specific to the current process within result_folder
+    so that several workers can evaluate individuals at the same time. If no context is provided, use the context loaded
+    by the worker (if any)"""
+
+    # get context
+    if context is None:
+        context = WORKER_CONTEXT
+
+    # isolate worker
+    if isolate:
+        if not os.path.isdir(result_folder):
+            os.makedirs(result_folder, exist_ok=True)
+        result_folder = f"{result_folder}/worker_{os.getpid()}"
+
+    # compute score
+    score = 0
     try:
-        score_b = fitness(b, result_folder, configuration_file)
+        score = fitness(gene_to_pos, result_folder, configuration_file, context)
     except:
         pass
+
+    return score
+
+
+def evaluate_individuals(individuals:list, result_folder:str, configuration_file:str, executor:ProcessPoolExecutor=None, cache:dict=None, context:dict=None) -> list:
+    """Compute fitness of a list of individuals, across an evaluation pool if one is provided.
+    If a fitness cache is provided, individuals already scored are not evaluated again
+
+    Args:
+        - individuals (list) : list of individuals (gene to position)
+        - result_folder (str) : path to the scratch folder, each worker use its own sub folder
+        - configuration_file (str) : path to the configuration file
+        - executor (ProcessPoolExecutor) : evaluation pool, as returned by create_evaluation_pool, None to run serially
+        - cache (dict) : fitness cache, as returned by init_fitness_cache, can be None
+        - context (dict) : evaluation context, as returned by load_evaluation_context, can be None
+
+    Returns:
+        - (list) : scores, in the same order as individuals
     
-    return (a, score_a) if score_a > score_b else (b, score_b)
+    """
 
+    # look for individuals in cache, evaluate only once individuals present several times
+    key_to_score = {}
+    to_evaluate = []
+    if cache is not None:
+        config_hash = context['config_hash'] if context else compute_config_hash(configuration_file)
+        keys = [individual_key(ind, config_hash) for ind in individuals]
+        for key, ind in zip(keys, individuals):
+            if key in key_to_score:
+                cache["hits"] += 1
+            elif key in cache["entries"]:
+                cache["hits"] += 1
+                cache["entries"].move_to_end(key)
+                key_to_score[key] = cache["entries"][key]
+            else:
+                cache["misses"] += 1
+                key_to_score[key] = None
+                to_evaluate.append((key, ind))
+    else:
+        keys = list(range(len(individuals)))
+        to_evaluate = list(zip(keys, individuals))
+
+    # serial run
+    n = len(to_evaluate)
+    if executor is None or n <= 1:
+        scores = [safe_fitness(ind, result_folder, configuration_file, False, context) for key, ind in to_evaluate]
+
+    # parallel run on the evaluation pool
+    else:
+        scores = list(executor.map(safe_fitness, [ind for key, ind in to_evaluate], [result_folder] * n, [configuration_file] * n, [True] * n))
+
+    # update cache
+    for (key, ind), score in zip(to_evaluate, scores):
+        key_to_score[key] = score
+        if cache is not None:
+            cache["entries"][key] = score
+            if len(cache["entries"]) > cache["max_size"]:
+                cache["entries"].popitem(last=False)
+
+    return [key_to_score[key] for key in keys]
+
+
+def evaluate_permutations(population:np.array, genes:list, result_folder:str, configuration_file:str, executor:ProcessPoolExecutor=None, cache:dict=None, context:dict=None) -> np.array:
+    """Compute fitness of each individual (row) of a population
 
-def evaluate_population(population:list, result_folder:str, configuration_file:str):
-    """ """
+    Args:
+        - population (np.array) : population, integer array of shape (size x n_genes)
+        - genes (list) : list of genes, in population columns order
+        - result_folder (str) : path to the scratch folder
+        - configuration_file (str) : path to the configuration file
+        - executor (ProcessPoolExecutor) : evaluation pool, None to run serially
+        - cache (dict) : fitness cache, can be None
+        - context (dict) : evaluation context, can be None
 
-    id_to_score = {}
-    id_to_ind = {}
-    id = 0
-    for ind in population:
-        score = 0
-        id +=1
-        try:
-            score = fitness(ind, result_folder, configuration_file)
-        except:
-            pass
+    Returns:
+        - (np.array) : scores, one per row
+    
+    """
+    individuals = [permutation_to_individual(permutation, genes) for permutation in population]
+    return np.array(evaluate_individuals(individuals, result_folder, configuration_file, executor, cache, context), dtype=float)
 
-        id_to_score[id] = score
-        id_to_ind[id] = ind
 
-    return (id_to_score, id_to_ind)
-        
+def selection(scores:np.array, n:int, rng:np.random.Generator, surrogate_scores:np.array=None) -> np.array:
+    """Sélection (tournoi à 2), run n tournaments at once on the whole population. If surrogate scores
+    are provided, candidates are compared on their fitness when both were fully evaluated (not nan),
+    else on their surrogate fitness, so that scores of different kinds are never compared
 
+    Args:
+        - scores (np.array) : fitness of each individual of the population
+        - n (int) : number of tournaments
+        - rng (np.random.Generator) : random generator
+        - surrogate_scores (np.array) : surrogate fitness of each individual, can be None
 
-def crossover(parent1, parent2, genes):
-    """ """
+    Returns:
+        - (np.array) : indexes of the winners
+    
+    """
+
+    # pick 2 distinct random candidates per tournament
+    size = len(scores)
+    a = rng.integers(0, size, size=n)
+    b = (a + rng.integers(1, size, size=n)) % size
+
+    # compare fitness, or surrogate fitness if one of the candidates was not fully evaluated
+    a_wins = scores[a] > scores[b]
+    if surrogate_scores is not None:
+        both_evaluated = ~np.isnan(scores[a]) & ~np.isnan(scores[b])
+        a_wins = np.where(both_evaluated, a_wins, surrogate_scores[a] > surrogate_scores[b])
+
+    return np.where(a_wins, a, b)
+
+
+def crossover(parents_1:np.array, parents_2:np.array, rng:np.random.Generator) -> np.array:
+    """Order crossover on whole arrays of parents : each child keeps a random segment of its first parent
+    and is completed with the remaining positions in the order of its second parent
+
+    Args:
+        - parents_1 (np.array) : first parents, integer array of shape (n x n_genes)
+        - parents_2 (np.array) : second parents, integer array of shape (n x n_genes)
+        - rng (np.random.Generator) : random generator
 
-    # On extrait juste les permutations
-    p1_perm = [parent1[g] for g in genes]
-    p2_perm = [parent2[g] for g in genes]
+    Returns:
+        - (np.array) : children, integer array of shape (n x n_genes)
+    
+    """
 
-    size = len(p1_perm)
-    start, end = sorted(random.sample(range(size), 2))
+    # draw segments
+    n, n_genes = parents_1.shape
+    a = rng.integers(0, n_genes, size=n)
+    b = (a + rng.integers(1, n_genes, size=n)) % n_genes
+    start = np.minimum(a, b)[:, None]
+    end = np.maximum(a, b)[:, None]
+    cols = np.arange(n_genes)
+    in_segment = (cols >= start) & (cols < end)
 
     # on prend un segment du parent1
-    child_perm = [None] * size
-    child_perm[start:end] = p1_perm[start:end]
+    rows = np.broadcast_to(np.arange(n)[:, None], (n, n_genes))
+    taken = np.zeros((n, n_genes), dtype=bool)
+    taken[rows[in_segment], parents_1[in_segment]] = True
+    children = np.where(in_segment, parents_1, 0)
 
     # on complète avec l'ordre du parent2
-    fill_values = [x for x in p2_perm if x not in child_perm]
-    idx = 0
-    for i in range(size):
-        if child_perm[i] is None:
-            child_perm[i] = fill_values[idx]
-            idx += 1
+    keep = ~np.take_along_axis(taken, parents_2, axis=1)
+    children[~in_segment] = parents_2[keep]
+
+    return children
+
+
+def mutate(population:np.array, mutation_rate:float, rng:np.random.Generator, mode:str="swap") -> np.array:
+    """Mutate individuals of a population (in place) with a probability of mutation_rate
+
+    Args:
+        - population (np.array) : population, integer array of shape (size x n_genes)
+        - mutation_rate (float) : probability for an individual to mutate
+        - rng (np.random.Generator) : random generator
+        - mode (str) : 'swap' exchange the positions of 2 genes, 'inversion' reverse a random segment
+
+    Returns:
+        - (np.array) : mutated population
+    
+    """
 
-    return {gene: pos for gene, pos in zip(genes, child_perm)}
+    # pick mutated individuals & 2 distinct genes for each
+    size, n_genes = population.shape
+    mutated = np.flatnonzero(rng.random(size) < mutation_rate)
+    a = rng.integers(0, n_genes, size=len(mutated))
+    b = (a + rng.integers(1, n_genes, size=len(mutated))) % n_genes
 
+    # swap positions
+    if mode == "swap":
+        tmp = population[mutated, a]
+        population[mutated, a] = population[mutated, b]
+        population[mutated, b] = tmp
 
+    # reverse segments
+    elif mode == "inversion":
+        start = np.minimum(a, b)[:, None]
+        end = np.maximum(a, b)[:, None]
+        idx = np.broadcast_to(np.arange(n_genes), (len(mutated), n_genes))
+        idx = np.where((idx >= start) & (idx <= end), start + end - idx, idx)
+        population[mutated] = np.take_along_axis(population[mutated], idx, axis=1)
+
+    else:
+        raise ValueError(f"[!] Unknown mutation mode {mode}")
+
+    return population
+
+
+def evolve_population(population:np.array, scores:np.array, mutation_rate:float, rng:np.random.Generator, mutation_mode:str="swap", surrogate_scores:np.array=None) -> np.array:
+    """Craft the next generation : tournament selection of parents, order crossover and mutation
+
+    Args:
+        - population (np.array) : population, integer array of shape (size x n_genes)
+        - scores (np.array) : fitness of each individual of the population (nan if not fully evaluated)
+        - mutation_rate (float) : probability for a child to mutate
+        - rng (np.random.Generator) : random generator
+        - mutation_mode (str) : 'swap' or 'inversion'
+        - surrogate_scores (np.array) : surrogate fitness of each individual, can be None
+
+    Returns:
+        - (np.array) : new population
+    
+    """
+    size = population.shape[0]
+    parents_1 = population[selection(scores, size, rng, surrogate_scores)]
+    parents_2 = population[selection(scores, size, rng, surrogate_scores)]
+    children = crossover(parents_1, parents_2, rng)
+    return mutate(children, mutation_rate, rng, mutation_mode)
+
+
+def population_diversity(population:np.array, rng:np.random.Generator, n_pairs:int=256) -> float:
+    """Estimate the diversity of a population as the mean fraction of genes placed at different positions
+    between two individuals, computed on n_pairs random pairs of distinct individuals
+
+    Args:
+        - population (np.array) : population, integer array of shape (size x n_genes)
+        - rng (np.random.Generator) : random generator
+        - n_pairs (int) : number of random pairs used for the estimation
+
+    Returns:
+        - (float) : diversity, 0 when all individuals are identical, close to 1 for random permutations
+    
+    """
+    size = population.shape[0]
+    if size < 2:
+        return 0.0
+    a = rng.integers(0, size, size=n_pairs)
+    b = (a + rng.integers(1, size, size=n_pairs)) % size
+    return float(np.mean(population[a] != population[b]))
+
+
+def has_converged(history:list, window:int, tolerance:float) -> bool:
+    """Check if best and mean scores stopped improving (by more than tolerance) over the last window generations
+
+    Args:
+        - history (list) : list of (best, mean) scores, one per generation
+        - window (int) : number of generations to look back, 0 or None disable the check
+        - tolerance (float) : minimum improvement
+
+    Returns:
+        - (bool) : True if the run stagnates
+    
+    """
+    if not window or len(history) <= window:
+        return False
+    best_gain = history[-1][0] - max(h[0] for h in history[:-window])
+    mean_gain = history[-1][1] - max(h[1] for h in history[:-window])
+    return best_gain <= tolerance and mean_gain <= tolerance
 
 
-def mutate(individual, mutation_rate, genes):
-    if random.random() < mutation_rate:
-        g1, g2 = random.sample(genes, 2)
-        individual[g1], individual[g2] = individual[g2], individual[g1]
+def save_checkpoint(checkpoint_file:str, state:dict) -> None:
+    """Save the state of a GA run in a binary file, write a temporary file first so that a
+    preemption during the save never corrupts the last checkpoint
 
+    Args:
+        - checkpoint_file (str) : path to the checkpoint file
+        - state (dict) : GA state (generation, population, scores, rng states, best so far, cache file, result file sizes)
+    
+    """
+    with open(f"{checkpoint_file}.tmp", "wb") as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(f"{checkpoint_file}.tmp", checkpoint_file)
 
 
+def load_checkpoint(checkpoint_file:str) -> dict:
+    """Load the state of a GA run saved with save_checkpoint, return None if there is no checkpoint"""
+    if not checkpoint_file or not os.path.isfile(checkpoint_file):
+        return None
+    with open(checkpoint_file, "rb") as f:
+        return pickle.load(f)
 
 
+def append_results(result_file:str, genes:list, generation:int, population:np.array, scores:np.array, surrogate_scores:np.array=None, evaluated:np.array=None, island:int=None) -> None:
+    """Append the individuals of a generation to a result file, the header is written only if the file
+    does not exist yet. The initial population is recorded as generation -1
 
+    Args:
+        - result_file (str) : path to the result file
+        - genes (list) : list of genes, in population columns order
+        - generation (int) : generation number
+        - population (np.array) : population, integer array of shape (size x n_genes)
+        - scores (np.array) : fitness of each individual (nan if not fully evaluated)
+        - surrogate_scores (np.array) : surrogate fitness of each individual, SURROGATE_SCORE & FULL_EVALUATION
+                                        columns are only written if provided
+        - evaluated (np.array) : indexes of fully evaluated individuals, used with surrogate_scores
+        - island (int) : island id, ISLAND column is only written if provided
 
+    """
+    result_data = []
+    full_evaluation = np.isin(np.arange(len(population)), evaluated) if surrogate_scores is not None else None
+    for i, (permutation, score) in enumerate(zip(population, scores)):
+        row = {} if island is None else {"ISLAND": island}
+        row["GENERATION"] = generation
+        row["POSITION"] = permutation_to_individual(permutation, genes)
+        row["SCORE"] = score
+        if surrogate_scores is not None:
+            row["SURROGATE_SCORE"] = surrogate_scores[i]
+            row["FULL_EVALUATION"] = bool(full_evaluation[i])
+        result_data.append(row)
+    pd.DataFrame.from_dict(result_data).to_csv(result_file, mode="a", header=not os.path.isfile(result_file), index=False)
 
 
 def extract_optimal_position(data_file, result_file):
     """ """
 
     # load data & set paramaters
-    df = pd.read_csv(data_file)
-    genes = list(df.keys())[1:-1]
-    possible_positions = list(range(len(genes)))  # autant de positions que de gènes
-    pop_size = 2
-    n_generation = 1
-    mutation_rate = 0.3
+    genes = list(pd.read_csv(data_file, nrows=0).keys())[1:-1]
     result_folder = "/tmp/ga_gim"
     configuration_file = "ressources/example_config.yaml"
-    result_data = []
+
+    # split the population between islands if asked
+    with open(configuration_file, "r") as f:
+        config = yaml.safe_load(f)
+    if config.get('n_islands', 1) > 1:
+        return run_island_model(data_file, result_file, configuration_file)
+
+    # load evaluation context, evaluation pool (created once for the whole run) & fitness cache
+    context = load_evaluation_context(configuration_file)
+    config = context['config']
+    executor = create_evaluation_pool(config.get('n_jobs', 1), configuration_file)
+    cache = init_fitness_cache(config.get('fitness_cache_size', 10000), config.get('fitness_cache_file'))
+
+    # GA parameters
+    pop_size = config.get('pop_size', 2)
+    n_generation = config.get('n_generation', 1)
+    mutation_rate = config.get('mutation_rate', 0.3)
+    mutation_mode = config.get('mutation_mode', 'swap')
+    use_surrogate = config.get('surrogate', False)
+    rng = np.random.default_rng(config.get('seed'))
+
+    # convergence parameters & metrics stream
+    stagnation_window = config.get('stagnation_window', 0)
+    stagnation_tolerance = config.get('stagnation_tolerance', 1e-4)
+    min_diversity = config.get('min_diversity', 0.0)
+    metrics_file = config.get('metrics_file', os.path.splitext(result_file)[0] + "_metrics.csv")
+    history = []
+
+    # checkpoint parameters
+    checkpoint_file = config.get('checkpoint_file')
+    checkpoint_interval = config.get('checkpoint_interval', 1)
+    checkpoint = load_checkpoint(checkpoint_file) if config.get('resume', False) else None
+
+    # resume from last checkpoint
+    if checkpoint is not None:
+        start_gen = checkpoint['generation']
+        population = checkpoint['population']
+        scores = checkpoint['scores']
+        surrogate_scores = checkpoint.get('surrogate_scores')
+        best_score = checkpoint['best_score']
+        best_pos = checkpoint['best_pos']
+        history = checkpoint['history']
+        rng.bit_generator.state = checkpoint['rng_state']
+        random.setstate(checkpoint['random_state'])
+        if checkpoint['cache_file'] and checkpoint['cache_file'] != cache['cache_file']:
+            cache = init_fitness_cache(cache['max_size'], checkpoint['cache_file'])
+
+        # drop result & metrics rows written after the checkpoint
+        for file_name, size in [(result_file, checkpoint['result_size']), (metrics_file, checkpoint['metrics_size'])]:
+            if os.path.isfile(file_name):
+                with open(file_name, "r+b") as f:
+                    f.truncate(size)
+        print(f"[GA] RESUME FROM GENERATION {start_gen}")
 
     # init population
-    perfect_order = {}
-    best_score = 0
-    best_pos = None
-    population = generate_population(pop_size, genes, possible_positions)
-    for gen in range(n_generation):
-        new_population = []
-        for _ in range(pop_size):
-
-            # take random parents
-            s1 = selection(population, result_folder, configuration_file)
-            parent1 = s1[0]
-            score1 = s1[1]
-            s2 = selection(population, result_folder, configuration_file)
-            parent2 = s2[0]
-            score2 = s2[1]
-
-            # look for perfect parent
-            if score1 == 1.0:
-                print("FIND PERFECT ORDER")
-                best_pos = parent1
-                best_score = score1
-                break
-            if score2 == 1.0:
-                print("FIND PERFECT ORDER")
-                best_pos = parent2
-                best_score = score2
-                break
+    else:
+        start_gen = 0
+        population = generate_population(pop_size, len(genes), rng)
+        scores = evaluate_permutations(population, genes, result_folder, configuration_file, executor, cache, context)
+        surrogate_scores = None
+        best_score = scores.max()
+        best_pos = permutation_to_individual(population[scores.argmax()], genes)
+        if os.path.isfile(result_file):
+            os.remove(result_file)
+        append_results(result_file, genes, -1, population, scores, np.full(len(population), np.nan) if use_surrogate else None, np.arange(len(population)))
+        metrics = open(metrics_file, "w")
+        metrics.write("GENERATION,BEST,MEAN,DIVERSITY,FULL_EVALUATIONS,SURROGATE_EVALUATIONS,CACHE_HIT_RATE,SURROGATE_CORRELATION,SECONDS\n")
+        metrics.close()
+
+    for gen in range(start_gen, n_generation):
+
+        # look for perfect parent
+        if best_score == 1.0:
+            break
 
-            # create child
-            child = crossover(parent1, parent2, genes)
-            mutate(child, mutation_rate, genes)
-            new_population.append(child)
-        
         # assemble new population
-        population = new_population
-        results = evaluate_population(population, result_folder, configuration_file)
-        id_to_score = results[0]
-        id_to_pos = results[1] 
-
-        # update data results
-        for id in id_to_score:
-            result_data.append(
-                {
-                    "GENERATION": gen,
-                    "POSITION":id_to_pos[id],
-                    "SCORE" : id_to_score[id]
-                }
-            )
-            
-            # find best positions
-            if id_to_score[id] > best_score:
-                best_score = id_to_score[id]
-                best_pos = id_to_pos[id]
-
-        # check if best position is perfect positions
-        if best_score == 1.0:
-            print("FIND PERFECT ORDER")
+        start = time.time()
+        hits, misses = cache["hits"], cache["misses"]
+        correlation = float("nan")
+        population = evolve_population(population, scores, mutation_rate, rng, mutation_mode, surrogate_scores)
+
+        # evaluate new population, pre-screen with surrogate fitness if asked
+        if use_surrogate:
+            scores, surrogate_scores, evaluated, correlation = evaluate_with_surrogate(population, genes, result_folder, configuration_file, executor, cache, context, rng)
+            print(f"[GA][GENERATION {gen}] SURROGATE / FITNESS SPEARMAN CORRELATION ON AUDIT SAMPLE : {correlation} ({len(evaluated)} / {len(population)} fully evaluated)")
+        else:
+            scores = evaluate_permutations(population, genes, result_folder, configuration_file, executor, cache, context)
+            evaluated = np.arange(len(population))
+
+        # append generation results to the result file
+        append_results(result_file, genes, gen, population, scores, surrogate_scores, evaluated)
+
+        # find best positions, only among fully evaluated individuals
+        best_evaluated = evaluated[scores[evaluated].argmax()]
+        if scores[best_evaluated] > best_score:
+            best_score = scores[best_evaluated]
+            best_pos = permutation_to_individual(population[best_evaluated], genes)
+
+        # report fitness cache hit rate & persist cache
+        gen_hits = cache["hits"] - hits
+        gen_misses = cache["misses"] - misses
+        hit_rate = gen_hits / max(1, gen_hits + gen_misses) * 100.0
+        print(f"[GA][GENERATION {gen}] FITNESS CACHE HIT RATE : {hit_rate:.2f}% ({gen_hits} hits / {gen_misses} misses)")
+        save_fitness_cache(cache)
+
+        # write generation metrics, mean over fully evaluated individuals only
+        diversity = population_diversity(population, rng)
+        mean_score = scores[evaluated].mean()
+        n_surrogate = len(population) if use_surrogate else 0
+        history.append((best_score, mean_score))
+        metrics = open(metrics_file, "a")
+        metrics.write(f"{gen},{best_score},{mean_score},{diversity},{gen_misses},{n_surrogate},{hit_rate},{correlation},{time.time() - start}\n")
+        metrics.close()
+
+        # save checkpoint, results are already on disk : only keep their size to drop rows written after it
+        if checkpoint_file and ((gen + 1) % checkpoint_interval == 0 or gen + 1 == n_generation):
+            save_checkpoint(checkpoint_file, {
+                "generation":gen + 1,
+                "population":population,
+                "scores":scores,
+                "surrogate_scores":surrogate_scores,
+                "best_score":best_score,
+                "best_pos":best_pos,
+                "history":history,
+                "rng_state":rng.bit_generator.state,
+                "random_state":random.getstate(),
+                "cache_file":cache['cache_file'],
+                "result_size":os.path.getsize(result_file),
+                "metrics_size":os.path.getsize(metrics_file)
+            })
+
+        # stop when the run stagnates or the population collapsed
+        if has_converged(history, stagnation_window, stagnation_tolerance):
+            print(f"[GA][GENERATION {gen}] NO IMPROVEMENT OVER THE LAST {stagnation_window} GENERATIONS, STOP")
+            break
+        if diversity < min_diversity:
+            print(f"[GA][GENERATION {gen}] DIVERSITY COLLAPSED ({diversity}), STOP")
             break
 
-    # save data results
-    df = pd.DataFrame.from_dict(result_data)
-    df.to_csv(result_file, index=False)
+    # release evaluation pool
+    if executor is not None:
+        executor.shutdown()
+
+    # check if best position is perfect positions
+    if best_score == 1.0:
+        print("FIND PERFECT ORDER")
+
+    # make sure the result file exists even if no generation ran
+    if not os.path.isfile(result_file):
+        pd.DataFrame().to_csv(result_file, index=False)
 
     # return best results
     return (best_pos, best_score)
 
 
+def init_island_worker(n_threads:int, configuration_file:str) -> None:
+    """Initialize an island worker : pin torch threads, load the evaluation context and create a
+    fitness cache that lives as long as the worker"""
+    global WORKER_CACHE
+    init_evaluation_worker(n_threads, configuration_file)
+    config = WORKER_CONTEXT['config']
+    WORKER_CACHE = init_fitness_cache(config.get('fitness_cache_size', 10000))
+
+
+def evolve_island(island:dict, genes:list, n_generation:int, result_folder:str, configuration_file:str, result_file:str) -> dict:
+    """Evolve the sub-population of an island for n_generation generations, run within an island worker.
+    Results (initial population included) are appended to the island result file so that they never travel
+    back to the main process. Individuals are pre-screened with the surrogate fitness if asked in the configuration
+
+    Args:
+        - island (dict) : island state ('id', 'population', 'scores', 'surrogate_scores', 'rng_state', 'generation', 'best_score', 'best_pos')
+        - genes (list) : list of genes, in population columns order
+        - n_generation (int) : number of generations to run
+        - result_folder (str) : path to the scratch folder, each island use its own sub folder
+        - configuration_file (str) : path to the configuration file
+        - result_file (str) : path to the result file of the island
+
+    Returns:
+        - (dict) : updated island state, with statistics of the call ('hits', 'misses', 'n_surrogate', 'correlations', 'mean_score')
+    
+    """
+
+    # load island state
+    config = WORKER_CONTEXT['config']
+    mutation_rate = config.get('mutation_rate', 0.3)
+    mutation_mode = config.get('mutation_mode', 'swap')
+    use_surrogate = config.get('surrogate', False)
+    result_folder = f"{result_folder}/island_{island['id']}"
+    rng = np.random.default_rng()
+    rng.bit_generator.state = island['rng_state']
+    population = island['population']
+    scores = island['scores']
+    surrogate_scores = island['surrogate_scores']
+    hits, misses = WORKER_CACHE["hits"], WORKER_CACHE["misses"]
+    island['n_surrogate'] = 0
+    island['correlations'] = []
+
+    # evaluate & record initial population
+    if scores is None:
+        scores = evaluate_permutations(population, genes, result_folder, configuration_file, None, WORKER_CACHE, WORKER_CONTEXT)
+        append_results(result_file, genes, -1, population, scores, np.full(len(population), np.nan) if use_surrogate else None, np.arange(len(population)), island['id'])
+        island['best_score'] = scores.max()
+        island['best_pos'] = permutation_to_individual(population[scores.argmax()], genes)
+    evaluated = np.flatnonzero(~np.isnan(scores))
+
+    # run generations
+    for _ in range(n_generation):
+        if island['best_score'] == 1.0:
+            break
+        population = evolve_population(population, scores, mutation_rate, rng, mutation_mode, surrogate_scores)
+        if use_surrogate:
+            scores, surrogate_scores, evaluated, correlation = evaluate_with_surrogate(population, genes, result_folder, configuration_file, None, WORKER_CACHE, WORKER_CONTEXT, rng)
+            island['n_surrogate'] += len(population)
+            island['correlations'].append(correlation)
+        else:
+            scores = evaluate_permutations(population, genes, result_folder, configuration_file, None, WORKER_CACHE, WORKER_CONTEXT)
+            evaluated = np.arange(len(population))
+        append_results(result_file, genes, island['generation'], population, scores, surrogate_scores, evaluated, island['id'])
+        best_evaluated = evaluated[scores[evaluated].argmax()]
+        if scores[best_evaluated] > island['best_score']:
+            island['best_score'] = scores[best_evaluated]
+            island['best_pos'] = permutation_to_individual(population[best_evaluated], genes)
+        island['generation'] += 1
+
+    # update island state
+    island['population'] = population
+    island['scores'] = scores
+    island['surrogate_scores'] = surrogate_scores
+    island['rng_state'] = rng.bit_generator.state
+    island['hits'] = WORKER_CACHE["hits"] - hits
+    island['misses'] = WORKER_CACHE["misses"] - misses
+    island['mean_score'] = scores[evaluated].mean()
+
+    return island
+
+
+def migrate(islands:list, topology:str, n_migrants:int, rng:np.random.Generator) -> None:
+    """Send the best individuals of each island to its neighbours (in place), migrants replace the
+    worst individuals of the receiving island and keep their fitness (and surrogate fitness, if any)
+
+    Args:
+        - islands (list) : list of island states
+        - topology (str) : 'ring' (island i sends to i+1), 'complete' (every island sends to all others)
+                           or 'random' (every island sends to another random island)
+        - n_migrants (int) : number of individuals sent by an island to each of its neighbours
+        - rng (np.random.Generator) : random generator
+    
+    """
+
+    # compute receiving islands
+    n = len(islands)
+    if n < 2:
+        return
+    if topology == "ring":
+        links = [(i, (i + 1) % n) for i in range(n)]
+    elif topology == "complete":
+        links = [(i, j) for i in range(n) for j in range(n) if i != j]
+    elif topology == "random":
+        links = [(i, (i + int(rng.integers(1, n))) % n) for i in range(n)]
+    else:
+        raise ValueError(f"[!] Unknown migration topology {topology}")
+
+    # select migrants before any replacement, individuals not fully evaluated (nan) are never selected first
+    migrants = []
+    for island in islands:
+        best = np.argsort(-island['scores'], kind='stable')[:n_migrants]
+        surrogate_scores = island['surrogate_scores'][best].copy() if island['surrogate_scores'] is not None else np.full(len(best), np.nan)
+        migrants.append((island['population'][best].copy(), island['scores'][best].copy(), surrogate_scores))
+
+    # replace worst individuals with all incoming migrants
+    for dst in range(n):
+        sources = [src for src, d in links if d == dst]
+        if len(sources) == 0:
+            continue
+        population = np.concatenate([migrants[src][0] for src in sources])
+        scores = np.concatenate([migrants[src][1] for src in sources])
+        surrogate_scores = np.concatenate([migrants[src][2] for src in sources])
+        worst = np.argsort(islands[dst]['scores'], kind='stable')[:len(scores)]
+        islands[dst]['population'][worst] = population[:len(worst)]
+        islands[dst]['scores'][worst] = scores[:len(worst)]
+        if islands[dst]['surrogate_scores'] is not None:
+            islands[dst]['surrogate_scores'][worst] = surrogate_scores[:len(worst)]
+
+
+def run_island_model(data_file:str, result_file:str, configuration_file:str="ressources/example_config.yaml"):
+    """Island model GA : several sub-populations evolve in separate worker processes, the best individuals
+    migrate between islands every migration_interval generations (an epoch). Use n_islands, migration_interval,
+    n_migrants and migration_topology from the configuration file on top of the usual GA parameters. The
+    surrogate pre-screen, metrics file, stagnation & diversity stops and checkpoints work as for a single
+    population but at the epoch level : one metrics row and one checkpoint per epoch, stagnation_window is
+    rounded up to whole epochs. n_jobs and fitness_cache_file are ignored, islands run on n_islands workers
+    with their own in-memory fitness cache
+
+    Args:
+        - data_file (str) : path to the data file
+        - result_file (str) : path to the file for saving results
+        - configuration_file (str) : path to the configuration file
+
+    Returns:
+        - (tuple) : best individual (gene to position) and its score
+    
+    """
+
+    # load data & set paramaters
+    genes = list(pd.read_csv(data_file, nrows=0).keys())[1:-1]
+    result_folder = "/tmp/ga_gim"
+    with open(configuration_file, "r") as f:
+        config = yaml.safe_load(f)
+    pop_size = config.get('pop_size', 2)
+    n_generation = config.get('n_generation', 1)
+    n_islands = config.get('n_islands', 4)
+    migration_interval = config.get('migration_interval', 5)
+    n_migrants = min(config.get('n_migrants', 1), pop_size)
+    topology = config.get('migration_topology', 'ring')
+
+    # options of the single population GA that do not apply to islands
+    if config.get('n_jobs', 1) != 1:
+        print(f"[GA][ISLANDS][!] n_jobs is ignored, islands run on {n_islands} worker processes")
+    if config.get('fitness_cache_file'):
+        print("[GA][ISLANDS][!] fitness_cache_file is ignored, each island worker keeps its own in-memory fitness cache")
+
+    # convergence parameters & metrics stream
+    stagnation_window = int(np.ceil(config.get('stagnation_window', 0) / migration_interval))
+    stagnation_tolerance = config.get('stagnation_tolerance', 1e-4)
+    min_diversity = config.get('min_diversity', 0.0)
+    metrics_file = config.get('metrics_file', os.path.splitext(result_file)[0] + "_metrics.csv")
+    island_files = [os.path.splitext(result_file)[0] + f"_island_{i}.csv" for i in range(n_islands)]
+    history = []
+
+    # checkpoint parameters
+    checkpoint_file = config.get('checkpoint_file')
+    checkpoint = load_checkpoint(checkpoint_file) if config.get('resume', False) else None
+    seed_sequence = np.random.SeedSequence(config.get('seed'))
+    rng = np.random.default_rng(seed_sequence.spawn(1)[0])
+
+    # resume from last checkpoint, drop result & metrics rows written after it
+    if checkpoint is not None:
+        n_done = checkpoint['generation']
+        islands = checkpoint['islands']
+        history = checkpoint['history']
+        rng.bit_generator.state = checkpoint['rng_state']
+        for file_name, size in zip(island_files + [metrics_file], checkpoint['island_sizes'] + [checkpoint['metrics_size']]):
+            if os.path.isfile(file_name):
+                with open(file_name, "r+b") as f:
+                    f.truncate(size)
+        print(f"[GA][ISLANDS] RESUME FROM GENERATION {n_done}")
+
+    # init islands, each with its own random stream, results of each island are written in their own file
+    else:
+        n_done = 0
+        islands = []
+        for i, island_seed in enumerate(seed_sequence.spawn(n_islands)):
+            island_rng = np.random.default_rng(island_seed)
+            islands.append({
+                "id":i,
+                "population":generate_population(pop_size, len(genes), island_rng),
+                "scores":None,
+                "surrogate_scores":None,
+                "rng_state":island_rng.bit_generator.state,
+                "generation":0,
+                "best_score":0,
+                "best_pos":None
+            })
+        for file_name in island_files:
+            if os.path.isfile(file_name):
+                os.remove(file_name)
+        metrics = open(metrics_file, "w")
+        metrics.write("GENERATION,BEST,MEAN,DIVERSITY,FULL_EVALUATIONS,SURROGATE_EVALUATIONS,CACHE_HIT_RATE,SURROGATE_CORRELATION,SECONDS\n")
+        metrics.close()
+
+    # evolve islands in parallel, migrate between epochs
+    n_threads = max(1, os.cpu_count() // n_islands)
+    with ProcessPoolExecutor(max_workers=n_islands, mp_context=multiprocessing.get_context("spawn"), initializer=init_island_worker, initargs=(n_threads, configuration_file)) as executor:
+        while islands[0]['scores'] is None or (n_done < n_generation and max(island['best_score'] for island in islands) < 1.0):
+            start = time.time()
+            n_epoch = min(migration_interval, n_generation - n_done)
+            islands = list(executor.map(evolve_island, islands, [genes] * n_islands, [n_epoch] * n_islands, [result_folder] * n_islands, [configuration_file] * n_islands, island_files))
+            n_done += n_epoch
+            best_score = max(island['best_score'] for island in islands)
+            print(f"[GA][ISLANDS][GENERATION {n_done}] BEST SCORE : {best_score}")
+
+            # write epoch metrics, mean over fully evaluated individuals only
+            diversity = population_diversity(np.concatenate([island['population'] for island in islands]), rng)
+            mean_score = float(np.mean([island['mean_score'] for island in islands]))
+            epoch_hits = sum(island['hits'] for island in islands)
+            epoch_misses = sum(island['misses'] for island in islands)
+            hit_rate = epoch_hits / max(1, epoch_hits + epoch_misses) * 100.0
+            correlations = [c for island in islands for c in island['correlations']]
+            correlation = float(np.mean(correlations)) if len(correlations) > 0 else float("nan")
+            history.append((best_score, mean_score))
+            metrics = open(metrics_file, "a")
+            metrics.write(f"{n_done - 1},{best_score},{mean_score},{diversity},{epoch_misses},{sum(island['n_surrogate'] for island in islands)},{hit_rate},{correlation},{time.time() - start}\n")
+            metrics.close()
+
+            # stop when the run stagnates or the population collapsed, else migrate
+            stop = False
+            if has_converged(history, stagnation_window, stagnation_tolerance):
+                print(f"[GA][ISLANDS][GENERATION {n_done}] NO IMPROVEMENT OVER THE LAST {stagnation_window} EPOCHS, STOP")
+                stop = True
+            elif diversity < min_diversity:
+                print(f"[GA][ISLANDS][GENERATION {n_done}] DIVERSITY COLLAPSED ({diversity}), STOP")
+                stop = True
+            elif n_done < n_generation and best_score < 1.0:
+                migrate(islands, topology, n_migrants, rng)
+
+            # save checkpoint, results are already on disk : only keep their size to drop rows written after it
+            if checkpoint_file:
+                save_checkpoint(checkpoint_file, {
+                    "generation":n_done,
+                    "islands":islands,
+                    "history":history,
+                    "rng_state":rng.bit_generator.state,
+                    "island_sizes":[os.path.getsize(file_name) if os.path.isfile(file_name) else 0 for file_name in island_files],
+                    "metrics_size":os.path.getsize(metrics_file)
+                })
+            if stop:
+                break
+
+    # gather results, keep a single header (island files are gone if a finished run is resumed)
+    best_island = max(islands, key=lambda island: island['best_score'])
+    if any(os.path.isfile(file_name) for file_name in island_files):
+        with open(result_file, "w") as out:
+            header_written = False
+            for file_name in island_files:
+                if not os.path.isfile(file_name):
+                    continue
+                with open(file_name, "r") as f:
+                    header = f.readline()
+                    if not header_written:
+                        out.write(header)
+                        header_written = True
+                    shutil.copyfileobj(f, out)
+                os.remove(file_name)
+
+    return (best_island['best_pos'], best_island['best_score'])
+
+
 if __name__ == "__main__":
 
 
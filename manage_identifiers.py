@@ -0,0 +1,265 @@
+import os
+import sqlite3
+import pandas as pd
+from mygene import MyGeneInfo
+
+# local importation
+import manage_stringdb
+
+
+IDENTIFIER_DATABASE = "data/identifiers.sqlite"
+MART_FILE = "data/mart_export.txt"
+NAMESPACES = ["symbol", "ensembl", "entrez", "uniprot", "string"]
+
+# mygene scope / field of each namespace (string ids are not available in mygene)
+MYGENE_FIELDS = {"symbol":"symbol", "ensembl":"ensembl.gene", "entrez":"entrezgene", "uniprot":"uniprot"}
+
+# columns of the mart export file to namespaces
+MART_COLUMNS = {
+    "Gene stable ID":"ensembl",
+    "NCBI gene (formerly Entrezgene) ID":"entrez",
+    "Gene name":"symbol",
+    "UniProtKB/Swiss-Prot ID":"uniprot"
+}
+
+# stringdb alias source holding approved HGNC symbols (previous & alias symbols have their own sources)
+SYMBOL_SOURCES = ["Ensembl_HGNC_symbol"]
+
+# mappings already resolved by the current process, (database, from namespace, to namespace) to {identifier:list of identifiers}
+IDENTIFIER_CACHE = {}
+
+
+def extract_string_identifiers(alias_file:str, info_file:str) -> pd.DataFrame:
+    """Extract identifiers of human proteins from stringdb ressource files
+
+    Args:
+        - alias_file (str) : path to the stringdb alias file, skipped if missing
+        - info_file (str) : path to the stringdb info file, skipped if missing
+
+    Returns:
+        - (pd.DataFrame) : columns are string (stringdb protein id), namespace and identifier
+
+    """
+    frames = []
+
+    # preferred names
+    if os.path.isfile(info_file):
+        info = manage_stringdb.load_string_info(info_file)
+        frames.append(pd.DataFrame({"string":info.index, "namespace":"symbol", "identifier":info['preferred_name'].to_numpy()}))
+        frames.append(pd.DataFrame({"string":info.index, "namespace":"string", "identifier":info.index}))
+
+    # aliases, classified by source
+    if os.path.isfile(alias_file):
+        store = manage_stringdb.load_string_aliases(alias_file)
+        species = pd.Series(store['proteins']).str.startswith(f"{manage_stringdb.STRINGDB_SPECIES}.").to_numpy()
+        rows = species[store['protein']]
+        aliases = pd.DataFrame({
+            "string":store['proteins'][store['protein'][rows]],
+            "alias":store['aliases'][store['alias'][rows]],
+            "source":store['sources'][store['source'][rows]]
+        })
+        rules = {
+            "ensembl":aliases['alias'].str.startswith("ENSG"),
+            "uniprot":aliases['source'].str.contains("UniProt_AC"),
+            "entrez":aliases['source'].str.contains("EntrezGene") & aliases['alias'].str.isdigit(),
+            "symbol":aliases['source'].isin(SYMBOL_SOURCES)
+        }
+        for namespace in rules:
+            selected = aliases[rules[namespace]]
+            frames.append(pd.DataFrame({"string":selected['string'], "namespace":namespace, "identifier":selected['alias']}))
+
+    if len(frames) == 0:
+        return pd.DataFrame(columns=["string", "namespace", "identifier"])
+    return pd.concat(frames, ignore_index=True).drop_duplicates()
+
+
+def get_source_stats(source_files:list) -> list:
+    """Return (path, size, modification time in ns) of each source file, size & time are -1 for missing files"""
+    stats = []
+    for source_file in source_files:
+        if os.path.isfile(source_file):
+            stat = os.stat(source_file)
+            stats.append((source_file, stat.st_size, stat.st_mtime_ns))
+        else:
+            stats.append((source_file, -1, -1))
+    return stats
+
+
+def is_database_valid(database:str) -> bool:
+    """Check if the identifier database exists and was built from the current version of its source files,
+    i.e same size & modification time as recorded in its meta table
+
+    Args:
+        - database (str) : path to the sqlite database
+
+    Returns:
+        - (bool) : True if the database can be used
+
+    """
+    if not os.path.isfile(database):
+        return False
+    connection = sqlite3.connect(database)
+    try:
+        meta = connection.execute("SELECT file, size, mtime_ns FROM meta ORDER BY rowid").fetchall()
+    except sqlite3.Error:
+        return False
+    finally:
+        connection.close()
+    return len(meta) > 0 and meta == get_source_stats([row[0] for row in meta])
+
+
+def build_identifier_database(database:str=IDENTIFIER_DATABASE, alias_file:str=manage_stringdb.STRINGDB_ALIAS_FILE, info_file:str=manage_stringdb.STRINGDB_INFO_FILE, mart_file:str=MART_FILE) -> None:
+    """Build the identifier mapping database (sqlite) from stringdb alias & info files and from the mart export
+    file, every pair of identifiers of a same protein (stringdb) or of a same mart entry is stored in both directions.
+    Size & modification time of the source files are saved in a meta table so the database is rebuilt when they change
+
+    Args:
+        - database (str) : path to the sqlite database, overwritten if exists
+        - alias_file (str) : path to the stringdb alias file, skipped if missing
+        - info_file (str) : path to the stringdb info file, skipped if missing
+        - mart_file (str) : path to the mart export file, skipped if missing
+
+    """
+    pairs = []
+
+    # pairs of identifiers sharing a stringdb protein
+    identifiers = extract_string_identifiers(alias_file, info_file)
+    merged = identifiers.merge(identifiers, on="string", suffixes=("_from", "_to"))
+    merged = merged[merged['namespace_from'] != merged['namespace_to']]
+    pairs.append(pd.DataFrame({
+        "from_namespace":merged['namespace_from'],
+        "from_id":merged['identifier_from'],
+        "to_namespace":merged['namespace_to'],
+        "to_id":merged['identifier_to'],
+        "source":"stringdb"
+    }))
+
+    # pairs of identifiers sharing a mart entry
+    if os.path.isfile(mart_file):
+        mart = pd.read_csv(mart_file, dtype=str)
+        mart = mart[[c for c in MART_COLUMNS if c in mart.columns]].rename(columns=MART_COLUMNS)
+        for from_namespace in mart.columns:
+            for to_namespace in mart.columns:
+                if from_namespace != to_namespace:
+                    df = mart[[from_namespace, to_namespace]].dropna()
+                    pairs.append(pd.DataFrame({
+                        "from_namespace":from_namespace,
+                        "from_id":df[from_namespace].str.replace(r"\.0$", "", regex=True),
+                        "to_namespace":to_namespace,
+                        "to_id":df[to_namespace].str.replace(r"\.0$", "", regex=True),
+                        "source":"mart"
+                    }))
+
+    # write database
+    pairs = pd.concat(pairs, ignore_index=True).drop_duplicates(subset=["from_namespace", "from_id", "to_namespace", "to_id"])
+    if os.path.isfile(database):
+        os.remove(database)
+    connection = sqlite3.connect(database)
+    pairs.to_sql("mapping", connection, index=False)
+    connection.execute("CREATE INDEX mapping_index ON mapping (from_namespace, to_namespace, from_id)")
+    connection.execute("CREATE TABLE unresolved (from_namespace TEXT, from_id TEXT, to_namespace TEXT)")
+    connection.execute("CREATE TABLE meta (file TEXT, size INTEGER, mtime_ns INTEGER)")
+    connection.executemany("INSERT INTO meta VALUES (?, ?, ?)", get_source_stats([alias_file, info_file, mart_file]))
+    connection.commit()
+    connection.close()
+    print(f"[IDENTIFIERS] {len(pairs)} mappings saved in {database}")
+
+
+def query_mygene(identifiers:list, from_namespace:str, to_namespace:str) -> dict:
+    """Resolve identifiers with mygene (network)
+
+    Args:
+        - identifiers (list) : list of identifiers
+        - from_namespace (str) : namespace of the identifiers
+        - to_namespace (str) : target namespace
+
+    Returns:
+        - (dict) : identifier to list of mapped identifiers
+
+    """
+    results = MyGeneInfo().querymany(identifiers, scopes=MYGENE_FIELDS[from_namespace], fields=MYGENE_FIELDS[to_namespace], species="human")
+    mapping = {}
+    for res in results:
+        value = res.get(MYGENE_FIELDS[to_namespace].split(".")[0])
+        if to_namespace == "ensembl":
+            value = [d.get("gene") for d in value] if isinstance(value, list) else value.get("gene") if isinstance(value, dict) else None
+        elif to_namespace == "uniprot" and isinstance(value, dict):
+            value = value.get('Swiss-Prot') or value.get('TrEMBL')
+        if value is None:
+            continue
+        for v in value if isinstance(value, list) else [value]:
+            if v is not None and str(v) not in mapping.setdefault(res['query'], []):
+                mapping[res['query']].append(str(v))
+    return mapping
+
+
+def map_identifiers(identifiers:list, from_namespace:str, to_namespace:str, database:str=IDENTIFIER_DATABASE, use_mygene:bool=False) -> dict:
+    """Map identifiers from a namespace to another using the local identifier database, lookups are batched and
+    results are kept in memory. Identifiers missing from the database can be resolved with mygene, results
+    (including failures) are then saved in the database so they are never requested again
+
+    Args:
+        - identifiers (list) : list of identifiers
+        - from_namespace (str) : namespace of the identifiers (symbol, ensembl, entrez, uniprot or string)
+        - to_namespace (str) : target namespace (symbol, ensembl, entrez, uniprot or string)
+        - database (str) : path to the sqlite database, built from default ressource files if missing or
+                           rebuilt if its source files changed
+        - use_mygene (bool) : if True, query mygene for identifiers missing from the database
+
+    Returns:
+        - (dict) : identifier to list of mapped identifiers, only for mapped identifiers
+
+    """
+
+    # check namespaces
+    for namespace in [from_namespace, to_namespace]:
+        if namespace not in NAMESPACES:
+            raise ValueError(f"unknown namespace {namespace}, should be one of {NAMESPACES}")
+
+    # (re)build database if needed, forget what was resolved with the previous one
+    if not is_database_valid(database):
+        build_identifier_database(database)
+        for key in [k for k in IDENTIFIER_CACHE if k[0] == database]:
+            del IDENTIFIER_CACHE[key]
+
+    # look for identifiers not resolved yet by this process
+    memo = IDENTIFIER_CACHE.setdefault((database, from_namespace, to_namespace), {})
+    missing = [i for i in pd.unique(pd.Series([str(i) for i in identifiers], dtype=object)) if i not in memo]
+
+    # batch lookups in database
+    if len(missing) > 0:
+        connection = sqlite3.connect(database)
+        for i in range(0, len(missing), 500):
+            batch = missing[i:i+500]
+            for identifier in batch:
+                memo[identifier] = []
+            query = f"SELECT from_id, to_id FROM mapping WHERE from_namespace=? AND to_namespace=? AND from_id IN ({','.join('?' * len(batch))}) ORDER BY rowid"
+            for from_id, to_id in connection.execute(query, [from_namespace, to_namespace] + batch):
+                memo[from_id].append(to_id)
+
+        # resolve remaining identifiers with mygene, cache results & failures
+        unresolved = [i for i in missing if len(memo[i]) == 0]
+        if use_mygene and len(unresolved) > 0 and from_namespace in MYGENE_FIELDS and to_namespace in MYGENE_FIELDS:
+            known_failures = set()
+            for i in range(0, len(unresolved), 500):
+                batch = unresolved[i:i+500]
+                query = f"SELECT from_id FROM unresolved WHERE from_namespace=? AND to_namespace=? AND from_id IN ({','.join('?' * len(batch))})"
+                known_failures.update(row[0] for row in connection.execute(query, [from_namespace, to_namespace] + batch))
+            unresolved = [i for i in unresolved if i not in known_failures]
+            if len(unresolved) > 0:
+                mapping = query_mygene(unresolved, from_namespace, to_namespace)
+                rows = [(from_namespace, i, to_namespace, v, "mygene") for i in mapping for v in mapping[i]]
+                connection.executemany("INSERT INTO mapping VALUES (?, ?, ?, ?, ?)", rows)
+                connection.executemany("INSERT INTO unresolved VALUES (?, ?, ?)", [(from_namespace, i, to_namespace) for i in unresolved if i not in mapping])
+                connection.commit()
+                for i in mapping:
+                    memo[i] = mapping[i]
+        connection.close()
+
+    return {str(i):memo[str(i)] for i in identifiers if len(memo[str(i)]) > 0}
+
+
+if __name__ == "__main__":
+
+    build_identifier_database()
+    print(map_identifiers(["EGFR", "TP53", "STAT1"], "symbol", "ensembl"))
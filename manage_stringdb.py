@@ -0,0 +1,417 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+
+
+# bump when the layout of the binary store changes, force a new conversion of the ressource files
+STRINGDB_STORE_VERSION = 2
+STRINGDB_CHUNK_SIZE = 5000000
+
+STRINGDB_SPECIES = 9606
+
+# default minimum combined score of the stringdb API network method (medium confidence)
+STRINGDB_REQUIRED_SCORE = 400
+
+# default location of the ressource files downloaded by get_data.get_data_from_stringdb
+STRINGDB_LINK_FILE = "data/9606.protein.links.v12.0.txt"
+STRINGDB_INFO_FILE = "data/9606.protein.info.v12.0.txt"
+STRINGDB_ALIAS_FILE = "data/stringdb_alias.txt"
+
+# stores already loaded by the current process, path of the ressource file to store
+STRINGDB_STORES = {}
+
+
+def get_store_folder(source_file:str) -> str:
+    """Get the path of the binary store associated to a stringdb ressource file
+
+    Args:
+        - source_file (str) : path to the stringdb ressource file
+
+    Returns:
+        - (str) : path to the store folder
+
+    """
+    return f"{source_file}.cache"
+
+
+def is_store_valid(source_file:str) -> bool:
+    """Check if the binary store of a ressource file exists and was built from the current version of the file,
+    i.e same size & modification time
+
+    Args:
+        - source_file (str) : path to the stringdb ressource file
+
+    Returns:
+        - (bool) : True if the store can be used
+
+    """
+    meta_file = f"{get_store_folder(source_file)}/meta.json"
+    if not os.path.isfile(meta_file):
+        return False
+    stat = os.stat(source_file)
+    with open(meta_file) as f:
+        meta = json.load(f)
+    return meta.get('version') == STRINGDB_STORE_VERSION and meta.get('size') == stat.st_size and meta.get('mtime_ns') == stat.st_mtime_ns
+
+
+def encode_values(values:pd.Series, value_to_id:dict, dictionary:list) -> np.array:
+    """Encode values as integer ids, unknown values are added to the dictionary
+
+    Args:
+        - values (pd.Series) : values to encode
+        - value_to_id (dict) : value to id, updated in place
+        - dictionary (list) : id to value, updated in place
+
+    Returns:
+        - (np.array) : int32 ids
+
+    """
+    for value in pd.unique(values):
+        if value not in value_to_id:
+            value_to_id[value] = len(dictionary)
+            dictionary.append(value)
+    return values.map(value_to_id).to_numpy(dtype=np.int32)
+
+
+def write_store(source_file:str, columns:dict, dictionaries:dict) -> None:
+    """Write the binary store of a ressource file, meta data are written last so an interrupted
+    conversion is never used
+
+    Args:
+        - source_file (str) : path to the stringdb ressource file
+        - columns (dict) : column name to numpy array
+        - dictionaries (dict) : dictionary name to list of values
+
+    """
+
+    # init folder, invalidate previous store
+    store_folder = get_store_folder(source_file)
+    if not os.path.isdir(store_folder):
+        os.makedirs(store_folder)
+    if os.path.isfile(f"{store_folder}/meta.json"):
+        os.remove(f"{store_folder}/meta.json")
+
+    # save columns & dictionaries
+    for name in columns:
+        np.save(f"{store_folder}/{name}.npy", columns[name])
+    for name in dictionaries:
+        with open(f"{store_folder}/{name}.txt", "w") as f:
+            f.write("\n".join(dictionaries[name]))
+
+    # save meta data
+    stat = os.stat(source_file)
+    with open(f"{store_folder}/meta.json", "w") as f:
+        json.dump({"version":STRINGDB_STORE_VERSION, "size":stat.st_size, "mtime_ns":stat.st_mtime_ns}, f)
+
+
+def read_dictionary(source_file:str, name:str) -> np.array:
+    """Read a dictionary (id to value) from the binary store of a ressource file
+
+    Args:
+        - source_file (str) : path to the stringdb ressource file
+        - name (str) : name of the dictionary
+
+    Returns:
+        - (np.array) : values, indexed by id
+
+    """
+    with open(f"{get_store_folder(source_file)}/{name}.txt") as f:
+        content = f.read()
+    return np.array(content.split("\n") if content else [], dtype=object)
+
+
+def build_index(keys:np.array, n_keys:int) -> tuple:
+    """Build an index of rows by key : rows sorted by key (file order kept within a key) and offsets,
+    rows of key i are order[offsets[i]:offsets[i+1]]
+
+    Args:
+        - keys (np.array) : integer key of each row
+        - n_keys (int) : number of keys
+
+    Returns:
+        - (np.array) : order, row indices sorted by key
+        - (np.array) : offsets
+
+    """
+    order = np.argsort(keys, kind="stable").astype(np.int64)
+    offsets = np.zeros(n_keys + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=n_keys), out=offsets[1:])
+    return order, offsets
+
+
+def lookup_rows(order:np.array, offsets:np.array, ids:np.array) -> np.array:
+    """Get rows associated to a set of keys using an index built by build_index, cost is proportional
+    to the number of returned rows
+
+    Args:
+        - order (np.array) : row indices sorted by key
+        - offsets (np.array) : offsets of keys in order
+        - ids (np.array) : keys to look for
+
+    Returns:
+        - (np.array) : row indices, in file order
+
+    """
+    if len(ids) == 0:
+        return np.zeros(0, dtype=np.int64)
+    return np.sort(np.concatenate([order[offsets[i]:offsets[i + 1]] for i in ids]))
+
+
+def convert_string_links(link_file:str) -> None:
+    """Convert a stringdb protein links file (protein1 protein2 combined_score) into a binary store :
+    int32 protein ids, uint16 scores, a protein dictionary and an index of links by protein1
+
+    Args:
+        - link_file (str) : path to the stringdb links file
+
+    """
+    protein_to_id = {}
+    proteins = []
+    protein1, protein2, scores = [], [], []
+    for chunk in pd.read_csv(link_file, sep=" ", dtype={'protein1':str, 'protein2':str, 'combined_score':np.uint16}, chunksize=STRINGDB_CHUNK_SIZE):
+        protein1.append(encode_values(chunk['protein1'], protein_to_id, proteins))
+        protein2.append(encode_values(chunk['protein2'], protein_to_id, proteins))
+        scores.append(chunk['combined_score'].to_numpy(dtype=np.uint16))
+    protein1 = np.concatenate(protein1) if protein1 else np.zeros(0, dtype=np.int32)
+    order, offsets = build_index(protein1, len(proteins))
+    write_store(link_file, {
+        "protein1":protein1,
+        "protein2":np.concatenate(protein2) if protein2 else np.zeros(0, dtype=np.int32),
+        "combined_score":np.concatenate(scores) if scores else np.zeros(0, dtype=np.uint16),
+        "order":order,
+        "offsets":offsets
+    }, {"proteins":proteins})
+
+
+def convert_string_aliases(alias_file:str) -> None:
+    """Convert a stringdb alias file (protein alias source) into a binary store : int32 protein, alias
+    and source ids, their dictionaries and an index of entries by alias
+
+    Args:
+        - alias_file (str) : path to the stringdb alias file
+
+    """
+    dictionaries = {"proteins":[], "aliases":[], "sources":[]}
+    value_to_id = {"proteins":{}, "aliases":{}, "sources":{}}
+    columns = {"protein":[], "alias":[], "source":[]}
+    for chunk in pd.read_csv(alias_file, sep="\t", skiprows=1, names=["protein", "alias", "source"], dtype=str, chunksize=STRINGDB_CHUNK_SIZE):
+        chunk = chunk.fillna("")
+        for column, name in [("protein", "proteins"), ("alias", "aliases"), ("source", "sources")]:
+            columns[column].append(encode_values(chunk[column], value_to_id[name], dictionaries[name]))
+    columns = {c:np.concatenate(columns[c]) if columns[c] else np.zeros(0, dtype=np.int32) for c in columns}
+    columns["order"], columns["offsets"] = build_index(columns["alias"], len(dictionaries["aliases"]))
+    write_store(alias_file, columns, dictionaries)
+
+
+def load_string_links(link_file:str) -> dict:
+    """Load stringdb protein links from the binary store (memory-mapped), convert the ressource file first if
+    the store is missing or outdated. Loaded stores are kept in memory for the rest of the process
+
+    Args:
+        - link_file (str) : path to the stringdb links file
+
+    Returns:
+        - (dict) : protein1 & protein2 (int32 ids), combined_score (uint16), proteins (id to protein),
+        protein_index (protein to id) and order & offsets (index of links by protein1)
+
+    """
+    if not is_store_valid(link_file):
+        print(f"[STRINGDB] Converting {link_file} ...")
+        convert_string_links(link_file)
+        STRINGDB_STORES.pop(link_file, None)
+    if link_file not in STRINGDB_STORES:
+        store_folder = get_store_folder(link_file)
+        store = {c:np.load(f"{store_folder}/{c}.npy", mmap_mode='r') for c in ["protein1", "protein2", "combined_score", "order", "offsets"]}
+        store["proteins"] = read_dictionary(link_file, "proteins")
+        store["protein_index"] = pd.Index(store["proteins"])
+        STRINGDB_STORES[link_file] = store
+    return STRINGDB_STORES[link_file]
+
+
+def load_string_aliases(alias_file:str) -> dict:
+    """Load stringdb aliases from the binary store (memory-mapped), convert the ressource file first if
+    the store is missing or outdated. Loaded stores are kept in memory for the rest of the process
+
+    Args:
+        - alias_file (str) : path to the stringdb alias file
+
+    Returns:
+        - (dict) : protein, alias & source (int32 ids), proteins, aliases & sources (id to value),
+        alias_index (alias to id) and order & offsets (index of entries by alias)
+
+    """
+    if not is_store_valid(alias_file):
+        print(f"[STRINGDB] Converting {alias_file} ...")
+        convert_string_aliases(alias_file)
+        STRINGDB_STORES.pop(alias_file, None)
+    if alias_file not in STRINGDB_STORES:
+        store_folder = get_store_folder(alias_file)
+        store = {c:np.load(f"{store_folder}/{c}.npy", mmap_mode='r') for c in ["protein", "alias", "source", "order", "offsets"]}
+        for name in ["proteins", "aliases", "sources"]:
+            store[name] = read_dictionary(alias_file, name)
+        store["alias_index"] = pd.Index(store["aliases"])
+        STRINGDB_STORES[alias_file] = store
+    return STRINGDB_STORES[alias_file]
+
+
+def get_ids(index:pd.Index, values:list) -> np.array:
+    """Get the ids of values in a store dictionary, values missing from the dictionary are ignored
+
+    Args:
+        - index (pd.Index) : index of the store dictionary (value to id)
+        - values (list) : values to look for
+
+    Returns:
+        - (np.array) : ids
+
+    """
+    ids = index.get_indexer(pd.unique(pd.Series(list(values), dtype=object)))
+    return ids[ids >= 0]
+
+
+def get_string_subnetwork(link_file:str, proteins:list) -> pd.DataFrame:
+    """Extract links between the given proteins (induced sub-network), same content and order as filtering
+    the raw links file on protein1 & protein2. Use the index of links by protein1, cost is proportional to
+    the degrees of the given proteins
+
+    Args:
+        - link_file (str) : path to the stringdb links file
+        - proteins (list) : list of stringdb protein ids
+
+    Returns:
+        - (pd.DataFrame) : links, columns are protein1, protein2 and combined_score
+
+    """
+    links = load_string_links(link_file)
+    ids = get_ids(links['protein_index'], proteins)
+    keep = np.zeros(len(links['proteins']), dtype=bool)
+    keep[ids] = True
+    rows = lookup_rows(links['order'], links['offsets'], ids)
+    rows = rows[keep[links['protein2'][rows]]]
+    return pd.DataFrame({
+        "protein1":links['proteins'][links['protein1'][rows]],
+        "protein2":links['proteins'][links['protein2'][rows]],
+        "combined_score":links['combined_score'][rows].astype(np.int64)
+    })
+
+
+def filter_string_aliases(alias_file:str, aliases:list) -> pd.DataFrame:
+    """Extract alias entries matching the given aliases, same content and order as filtering the raw alias file
+
+    Args:
+        - alias_file (str) : path to the stringdb alias file
+        - aliases (list) : list of aliases (e.g ENSG ids)
+
+    Returns:
+        - (pd.DataFrame) : aliases, columns are protein, alias and source
+
+    """
+    store = load_string_aliases(alias_file)
+    rows = lookup_rows(store['order'], store['offsets'], get_ids(store['alias_index'], aliases))
+    return pd.DataFrame({
+        "protein":store['proteins'][store['protein'][rows]],
+        "alias":store['aliases'][store['alias'][rows]],
+        "source":store['sources'][store['source'][rows]]
+    })
+
+
+def load_string_info(info_file:str) -> pd.DataFrame:
+    """Load stringdb protein info file (small file, no binary store), kept in memory for the rest of the process
+
+    Args:
+        - info_file (str) : path to the stringdb info file
+
+    Returns:
+        - (pd.DataFrame) : protein info, indexed by stringdb protein id
+
+    """
+    if info_file not in STRINGDB_STORES:
+        STRINGDB_STORES[info_file] = pd.read_csv(info_file, sep="\t", dtype=str).set_index('#string_protein_id')
+    return STRINGDB_STORES[info_file]
+
+
+def query_string_ids(identifiers:list, info_file:str=STRINGDB_INFO_FILE, alias_file:str=STRINGDB_ALIAS_FILE) -> list:
+    """Local stand-in for the stringdb API get_string_ids method (json format), map identifiers to stringdb ids
+    using the ressource files. Identifiers are matched as stringdb ids, then as preferred names, then as
+    aliases (first matching entry of the alias file for the species)
+
+    Args:
+        - identifiers (list) : list of identifiers (gene symbols, uniprot ids, ensembl ids ...)
+        - info_file (str) : path to the stringdb info file
+        - alias_file (str) : path to the stringdb alias file, not used if the file does not exist
+
+    Returns:
+        - (list) : list of dict with keys queryIndex, queryItem, stringId, ncbiTaxonId, preferredName & annotation,
+        one per mapped identifier
+
+    """
+
+    # match stringdb ids & preferred names
+    info = load_string_info(info_file)
+    query = pd.Series(list(identifiers), dtype=object)
+    string_ids = query.where(query.isin(info.index))
+    name_to_id = pd.Series(info.index, index=info['preferred_name']).groupby(level=0).first()
+    string_ids = string_ids.fillna(query.map(name_to_id))
+
+    # match aliases
+    missing = query[string_ids.isna()]
+    if len(missing) > 0 and os.path.isfile(alias_file):
+        aliases = filter_string_aliases(alias_file, missing)
+        aliases = aliases[aliases['protein'].str.startswith(f"{STRINGDB_SPECIES}.") & aliases['protein'].isin(info.index)]
+        alias_to_id = aliases.groupby('alias')['protein'].first()
+        string_ids = string_ids.fillna(query.map(alias_to_id))
+
+    # format results
+    results = []
+    for i, (item, string_id) in enumerate(zip(query, string_ids)):
+        if isinstance(string_id, str):
+            results.append({
+                "queryIndex":i,
+                "queryItem":item,
+                "stringId":string_id,
+                "ncbiTaxonId":STRINGDB_SPECIES,
+                "preferredName":info.at[string_id, 'preferred_name'],
+                "annotation":info.at[string_id, 'annotation'] if 'annotation' in info else ""
+            })
+    return results
+
+
+def query_network(identifiers:list, required_score:int=STRINGDB_REQUIRED_SCORE, link_file:str=STRINGDB_LINK_FILE, info_file:str=STRINGDB_INFO_FILE, alias_file:str=STRINGDB_ALIAS_FILE) -> list:
+    """Local stand-in for the stringdb API network method (json format), extract interactions between the
+    proteins of the identifiers from the ressource files. Each interaction is reported once, scores are
+    combined scores between 0 and 1
+
+    Args:
+        - identifiers (list) : list of identifiers (gene symbols, uniprot ids, stringdb ids ...)
+        - required_score (int) : minimum combined score (0 - 1000), defaults to the API default (400)
+        - link_file (str) : path to the stringdb links file
+        - info_file (str) : path to the stringdb info file
+        - alias_file (str) : path to the stringdb alias file
+
+    Returns:
+        - (list) : list of dict with keys stringId_A, stringId_B, preferredName_A, preferredName_B, ncbiTaxonId & score
+
+    """
+
+    # map identifiers & extract sub network
+    string_ids = pd.unique(pd.Series([elt['stringId'] for elt in query_string_ids(identifiers, info_file, alias_file)], dtype=object))
+    links = get_string_subnetwork(link_file, string_ids)
+    links = links[(links['combined_score'] >= required_score) & (links['protein1'] < links['protein2'])]
+
+    # format results
+    names = load_string_info(info_file)['preferred_name']
+    return [{
+        "stringId_A":protein1,
+        "stringId_B":protein2,
+        "preferredName_A":names[protein1],
+        "preferredName_B":names[protein2],
+        "ncbiTaxonId":STRINGDB_SPECIES,
+        "score":score / 1000
+    } for protein1, protein2, score in zip(links['protein1'], links['protein2'], links['combined_score'])]
+
+
+if __name__ == "__main__":
+
+    links = load_string_links("data/9606.protein.links.v12.0.txt")
+    print(f"[STRINGDB] {len(links['protein1'])} links between {len(links['proteins'])} proteins")
@@ -1,13 +1,14 @@
 import os
+import numpy as np
 import pandas as pd
 import umap.umap_ as umap
-import glob
 from sklearn.preprocessing import StandardScaler
 from sklearn.decomposition import PCA
 
 
 import build_signal
 import extract_gene_order
+import extract_features
 
 
 def get_pca(df:pd.DataFrame) -> pd.DataFrame:
@@ -62,25 +63,51 @@ def get_umap(df:pd.DataFrame) -> pd.DataFrame:
     return umap_df
 
 
-def get_wav(data_file, output_dir, prox_matrix, audio_duration):
-    """ """
+def get_wav(data_file, output_dir, prox_matrix, audio_duration, save_artifacts:bool=True) -> dict:
+    """Build one signal per sample from a random gene order and turn it into an audio file
+    ({output_dir}/data/{LABEL}/{ID}_signal.wav), all samples of a label are rendered at once.
+    If save_artifacts is set to False nothing is written, waveforms are returned instead
+
+    Returns:
+        - (dict) : label to (sample ids, float32 waveforms of shape samples x length), empty if save_artifacts is True
+
+    """
 
     # get gene order
     gene_to_pos = extract_gene_order.build_random_gene_order_from_data(data_file)
 
-    # build signal
-    build_signal.build_signal_from_computed_positions_multilabel(data_file, f"{output_dir}/data", gene_to_pos)
-
-    # turn into audio files
+    # build signal & turn into audio files or waveforms
     df = pd.read_csv(data_file)
     label_list = list(set(list(df['LABEL'])))
+    label_to_waveforms = {}
     for label in label_list:
-        for signal_file in glob.glob(f"{output_dir}/data/{label}/*.csv"):
-            build_signal.turn_signal_into_audio(signal_file, audio_duration)
+        signal_matrix = build_signal.build_signal_matrix(df[df['LABEL'] == label], gene_to_pos)
+        if save_artifacts:
+            build_signal.save_signal_matrix(signal_matrix, f"{output_dir}/data/{label}")
+            build_signal.turn_signal_matrix_into_audio(signal_matrix, f"{output_dir}/data/{label}", audio_duration)
+        else:
+            label_to_waveforms[label] = (signal_matrix['ids'], build_signal.turn_signal_matrix_into_waveforms(signal_matrix, audio_duration))
+
+    return label_to_waveforms
+
+
+def get_scat(label_to_waveforms:dict, J:int, Q:int, n_jobs:int=1) -> pd.DataFrame:
+    """Compute scat features from waveforms kept in memory, return one row per sample (ID, LABEL, features)"""
+
+    # extract features, all labels at once
+    ids = np.concatenate([label_to_waveforms[label][0] for label in label_to_waveforms])
+    labels = np.concatenate([[label] * len(label_to_waveforms[label][0]) for label in label_to_waveforms])
+    X = extract_features.extract_features_batch(np.concatenate([label_to_waveforms[label][1] for label in label_to_waveforms]), J, Q, n_jobs=n_jobs)
+
+    # craft & return df
+    df = pd.DataFrame(X, columns=[f"SCAT_{i}" for i in range(X.shape[1])])
+    df.insert(0, 'LABEL', labels)
+    df.insert(0, 'ID', ids)
+    return df
 
 
 
-def run(data_file, output_dir, prox_matrix, audio_duration):
+def run(data_file, output_dir, prox_matrix, audio_duration, save_artifacts:bool=True, J:int=2, Q:int=4, n_jobs:int=1):
     """ """
 
     # init output folder
@@ -102,8 +129,11 @@ def run(data_file, output_dir, prox_matrix, audio_duration):
     df_umap = get_umap(df)
     df_umap.to_csv(f"{output_dir}/data/umap.csv", index=False)
 
-    # save wav data
-    get_wav(data_file, output_dir, prox_matrix, audio_duration)
+    # save wav data, or only scat features in no disk mode
+    label_to_waveforms = get_wav(data_file, output_dir, prox_matrix, audio_duration, save_artifacts)
+    if not save_artifacts:
+        df_scat = get_scat(label_to_waveforms, J, Q, n_jobs)
+        df_scat.to_csv(f"{output_dir}/data/scat.csv", index=False)
 
     
 
@@ -18,8 +18,9 @@ import craft_report
 import build_gene_network
 import manage_gene_graph
 
-def toy_run():
-    """Toy, create its own toy dataset, build signal, transform to audio and train clf"""
+def toy_run(n_jobs:int=1, save_artifacts:bool=True):
+    """Toy, create its own toy dataset, build signal, transform to audio and train clf, features
+    are extracted with n_jobs worker processes, signal & audio files are only written if save_artifacts is set"""
 
     # clean signal folder
     print("[TOY] Cleaning")
@@ -32,37 +33,41 @@ def toy_run():
     print("[TOY] Creating data ...")
     craft_toy_data.craft_toy_data(50, 50, 25)    
 
-    # build signal
+    # build signal in memory, patients with ID < 50 are in group a
     print("[TOY] Building signal ...")
-    build_signal.build_random_signal("data/toy_data.csv", "signals")
+    df = pd.read_csv("data/toy_data.csv")
+    gene_to_pos = build_signal.build_random_positions(list(df.keys())[1:])
+    signal_matrix_a = build_signal.build_signal_matrix(df[df['ID'] < 50], gene_to_pos)
+    signal_matrix_b = build_signal.build_signal_matrix(df[df['ID'] >= 50], gene_to_pos)
     
-    # turn into audio files
+    # no disk mode : waveforms & scat features stay in memory
+    if not save_artifacts:
+        print("[TOY] Trainning Classifier ...")
+        simple_clf.run_svm_clf_from_signals(signal_matrix_a, signal_matrix_b, 4.0, n_jobs=n_jobs)
+        return
+
+    # save signal & turn into audio files
     print("[TOY] Converting to audio ...")
-    for signal_file in glob.glob("signals/*.csv"):
-        build_signal.turn_signal_into_audio(signal_file, 4.0)
+    for signal_matrix in [signal_matrix_a, signal_matrix_b]:
+        build_signal.save_signal_matrix(signal_matrix, "signals")
+        build_signal.turn_signal_matrix_into_audio(signal_matrix, "signals", 4.0)
 
     # prepare data for classification
-    file_list_a = []
-    file_list_b = []
-    for audio_file in glob.glob("signals/*.wav"):
-        nb = int(audio_file.split("/")[1].split("_")[0])
-        if nb < 50:
-            file_list_a.append(audio_file)
-        else:
-            file_list_b.append(audio_file)
+    file_list_a = [f"signals/{i}_signal.wav" for i in signal_matrix_a['ids']]
+    file_list_b = [f"signals/{i}_signal.wav" for i in signal_matrix_b['ids']]
             
     # run classification
     print("[TOY] Trainning Classifier ...")
-    simple_clf.run_svm_clf(file_list_a, file_list_b)
+    simple_clf.run_svm_clf(file_list_a, file_list_b, n_jobs=n_jobs)
 
 
-def demo_run():
-    """Demo run, showcase on generated fake gene data"""
+def demo_run(save_artifacts:bool=True):
+    """Demo run, showcase on generated fake gene data, signal, audio & sample files are only written if save_artifacts is set"""
 
     # params
     graph_image = "demo/graph.png"
     graph_file = "demo/graph.pickle"
-    distance_matrix = "demo/dist.csv"
+    distance_matrix = "demo/dist.npy"
     audio_duration = 4.0
     J = 2
     Q = 4
@@ -100,17 +105,23 @@ def demo_run():
     df_a.to_csv("demo/data_group_a.csv", index=False)
     df_b.to_csv("demo/data_group_b.csv", index=False)
 
-    # build signal
+    # build signal in memory
     print("[DEMO] Building signal ...")
-    build_signal.build_signal_from_computed_positions("demo/data_group_a.csv", "demo/group_a", gene_to_pos)
-    build_signal.build_signal_from_computed_positions("demo/data_group_b.csv", "demo/group_b", gene_to_pos)
+    signal_matrix_a = build_signal.build_signal_matrix(df_a, gene_to_pos)
+    signal_matrix_b = build_signal.build_signal_matrix(df_b, gene_to_pos)
 
-    # turn into audio files
+    # no disk mode : waveforms & scat features stay in memory
+    if not save_artifacts:
+        print("[DEMO] Training classifier ...")
+        simple_clf.run_log_clf_from_signals(signal_matrix_a, signal_matrix_b, J, Q, "demo/results.csv", audio_duration)
+        return
+
+    # save signal & turn into audio files
     print("[DEMO] Turning signal into audio ...")
-    for signal_file in glob.glob("demo/group_a/*.csv"):
-        build_signal.turn_signal_into_audio(signal_file, audio_duration)
-    for signal_file in glob.glob("demo/group_b/*.csv"):
-        build_signal.turn_signal_into_audio(signal_file, audio_duration)
+    build_signal.save_signal_matrix(signal_matrix_a, "demo/group_a")
+    build_signal.turn_signal_matrix_into_audio(signal_matrix_a, "demo/group_a", audio_duration)
+    build_signal.save_signal_matrix(signal_matrix_b, "demo/group_b")
+    build_signal.turn_signal_matrix_into_audio(signal_matrix_b, "demo/group_b", audio_duration)
 
     # prepare data for classification
     file_list_a = glob.glob("demo/group_a/*.wav")
@@ -161,46 +172,40 @@ def run_graph_mode(configuration_file):
     # build gene graph
     graph_image = f"{result_folder}/graph.png"
     graph_file = f"{result_folder}/graph.csv"
-    distance_matrix = f"{result_folder}/distance.csv"
-    build_gene_network.build_gene_network(gene_list, graph_image, graph_file, config['stringdb_threshold'])    
-    manage_gene_graph.compute_graph_distance(graph_file, distance_matrix)
+    distance_matrix = f"{result_folder}/distance.npy"
+    build_gene_network.build_gene_network(gene_list, graph_image, graph_file, config['stringdb_threshold'], config.get('stringdb_source', 'api'))    
+    manage_gene_graph.compute_graph_distance(graph_file, distance_matrix, n_jobs=config.get('n_jobs', 1))
     gene_to_pos = extract_gene_order.extract_order_from_graph_distances(distance_matrix)
 
-    # cleaning data
-    var_to_keep = ['ID']
+    # extract labels
     label_list = []
-    for elt in gene_to_pos.keys():
-        var_to_keep.append(elt)
     for label in df['GROUP']:
         if label not in label_list:
             label_list.append(label)
-    for label in label_list:
-        df_grp = df[df['GROUP'] == label]
-        df_grp = df_grp[var_to_keep]
-        df_grp.to_csv(f"{result_folder}/data_group_{label}.csv", index=False)
 
-    # build signal
+    # build signal in memory
+    label_to_signal_matrix = {}
     for label in label_list:
-        build_signal.build_signal_from_computed_positions(
-                                                          f"{result_folder}/data_group_{label}.csv",
-                                                          f"{result_folder}/group_{label}",
-                                                          gene_to_pos
-                                                      )
+        label_to_signal_matrix[label] = build_signal.build_signal_matrix(df[df['GROUP'] == label], gene_to_pos)
 
-    # turn into audio files
-    for label in label_list:
-        for signal_file in glob.glob(f"{result_folder}/group_{label}/*.csv"):
-            build_signal.turn_signal_into_audio(signal_file, config['audio_duration'])
-    
-    # prepare data for classification
+    # write signal, audio files and samples, skipped in no disk mode
+    save_artifacts = config.get('save_artifacts', True)
     label_to_audio_list = {}
-    for label in label_list:
-        label_to_audio_list[label] = glob.glob(f"{result_folder}/group_{label}/*.wav")
+    if save_artifacts:
 
-    # take samples
-    for label in label_list:
-        audio_file = label_to_audio_list[label][random.randint(0, len(label_to_audio_list[label])-1)]
-        extract_features.display_features(audio_file, config['J'], config['Q'], f"{result_folder}/signal_sample_group_{label}.png")        
+        # save signal & turn into audio files
+        for label in label_list:
+            build_signal.save_signal_matrix(label_to_signal_matrix[label], f"{result_folder}/group_{label}")
+            build_signal.turn_signal_matrix_into_audio(label_to_signal_matrix[label], f"{result_folder}/group_{label}", config['audio_duration'])
+    
+        # prepare data for classification
+        for label in label_list:
+            label_to_audio_list[label] = glob.glob(f"{result_folder}/group_{label}/*.wav")
+
+        # take samples
+        for label in label_list:
+            audio_file = label_to_audio_list[label][random.randint(0, len(label_to_audio_list[label])-1)]
+            extract_features.display_features(audio_file, config['J'], config['Q'], f"{result_folder}/signal_sample_group_{label}.png")        
 
     # ---------------#
     # Run Classifier #
@@ -208,17 +213,33 @@ def run_graph_mode(configuration_file):
 
     # deal with binary log
     if config['classifier'] == 'log':
-        if len(label_list) == 2:
+        if len(label_list) == 2 and save_artifacts:
             simple_clf.run_log_clf(
                     label_to_audio_list[label_list[0]],
                     label_to_audio_list[label_list[1]],
                     config['J'],
                     config['Q'],
                     f"{result_folder}/results.csv",
-                    config['audio_duration']
+                    config['audio_duration'],
+                    config.get('feature_store'),
+                    config.get('n_jobs', 1)
+            )
+        elif len(label_list) == 2:
+            simple_clf.run_log_clf_from_signals(
+                    label_to_signal_matrix[label_list[0]],
+                    label_to_signal_matrix[label_list[1]],
+                    config['J'],
+                    config['Q'],
+                    f"{result_folder}/results.csv",
+                    config['audio_duration'],
+                    config.get('feature_store'),
+                    config.get('n_jobs', 1)
             )
         else:
             print("[!] Can't run binary claffication with n labels != 2")
+
+    # release feature extraction workers
+    extract_features.close_feature_pools()
             
 
 
@@ -257,41 +278,35 @@ def run(configuration_file):
     # get gene to pos
     gene_to_pos = extract_gene_order.extract_order_from_protein_distances(config['data_file'], "data/9606.protein.links.v12.0.txt", "data/9606.protein.info.v12.0.txt", f"{result_folder}/extract_gene_order.log")
 
-    # cleaning data
-    var_to_keep = ['ID']
+    # extract labels
     label_list = []
-    for elt in gene_to_pos.keys():
-        var_to_keep.append(elt)
     for label in df['GROUP']:
         if label not in label_list:
             label_list.append(label)
-    for label in label_list:
-        df_grp = df[df['GROUP'] == label]
-        df_grp = df_grp[var_to_keep]
-        df_grp.to_csv(f"{result_folder}/data_group_{label}.csv", index=False)
 
-    # build signal
+    # build signal in memory
+    label_to_signal_matrix = {}
     for label in label_list:
-        build_signal.build_signal_from_computed_positions(
-                                                          f"{result_folder}/data_group_{label}.csv",
-                                                          f"{result_folder}/group_{label}",
-                                                          gene_to_pos
-                                                      )
+        label_to_signal_matrix[label] = build_signal.build_signal_matrix(df[df['GROUP'] == label], gene_to_pos)
 
-    # turn into audio files
-    for label in label_list:
-        for signal_file in glob.glob(f"{result_folder}/group_{label}/*.csv"):
-            build_signal.turn_signal_into_audio(signal_file, config['audio_duration'])
-    
-    # prepare data for classification
+    # write signal, audio files and samples, skipped in no disk mode
+    save_artifacts = config.get('save_artifacts', True)
     label_to_audio_list = {}
-    for label in label_list:
-        label_to_audio_list[label] = glob.glob(f"{result_folder}/group_{label}/*.wav")
+    if save_artifacts:
 
-    # take samples
-    for label in label_list:
-        audio_file = label_to_audio_list[label][random.randint(0, len(label_to_audio_list[label])-1)]
-        extract_features.display_features(audio_file, config['J'], config['Q'], f"{result_folder}/signal_sample_group_{label}.png")        
+        # save signal & turn into audio files
+        for label in label_list:
+            build_signal.save_signal_matrix(label_to_signal_matrix[label], f"{result_folder}/group_{label}")
+            build_signal.turn_signal_matrix_into_audio(label_to_signal_matrix[label], f"{result_folder}/group_{label}", config['audio_duration'])
+    
+        # prepare data for classification
+        for label in label_list:
+            label_to_audio_list[label] = glob.glob(f"{result_folder}/group_{label}/*.wav")
+
+        # take samples
+        for label in label_list:
+            audio_file = label_to_audio_list[label][random.randint(0, len(label_to_audio_list[label])-1)]
+            extract_features.display_features(audio_file, config['J'], config['Q'], f"{result_folder}/signal_sample_group_{label}.png")        
 
     # ---------------#
     # Run Classifier #
@@ -299,25 +314,42 @@ def run(configuration_file):
 
     # deal with binary log
     if config['classifier'] == 'log':
-        if len(label_list) == 2:
+        if len(label_list) == 2 and save_artifacts:
             simple_clf.run_log_clf(
                     label_to_audio_list[label_list[0]],
                     label_to_audio_list[label_list[1]],
                     config['J'],
                     config['Q'],
                     f"{result_folder}/results.csv",
-                    config['audio_duration']
+                    config['audio_duration'],
+                    config.get('feature_store'),
+                    config.get('n_jobs', 1)
+            )
+        elif len(label_list) == 2:
+            simple_clf.run_log_clf_from_signals(
+                    label_to_signal_matrix[label_list[0]],
+                    label_to_signal_matrix[label_list[1]],
+                    config['J'],
+                    config['Q'],
+                    f"{result_folder}/results.csv",
+                    config['audio_duration'],
+                    config.get('feature_store'),
+                    config.get('n_jobs', 1)
             )
         else:
             print("[!] Can't run binary claffication with n labels != 2")
 
+    # release feature extraction workers
+    extract_features.close_feature_pools()
+
 
 
 
     
-def simple_random_run():
+def simple_random_run(n_jobs:int=1, save_artifacts:bool=True):
     """Simple binary classification on tissue dataset, use random gene order and random
-    gene selection, basically there just to make sure this stuff compile on real data"""
+    gene selection, basically there just to make sure this stuff compile on real data,
+    features are extracted with n_jobs worker processes, signal & audio files are only written if save_artifacts is set"""
 
     # params
     n_genes = 100
@@ -326,27 +358,36 @@ def simple_random_run():
     # generate datasets from gcts
     craft_data.craft_reduce_datasets(["data/gene_reads_artery_aorta.gct", "data/gene_reads_artery_coronary.gct"], n_genes)
 
-    # build signal
-    build_signal.build_random_signal("data/gene_reads_artery_aorta.csv", "signals/aorta")
-    build_signal.build_random_signal("data/gene_reads_artery_coronary.csv", "signals/coronary")
+    # build signal in memory, both datasets share the same random gene order
+    df_a = pd.read_csv("data/gene_reads_artery_aorta.csv")
+    df_b = pd.read_csv("data/gene_reads_artery_coronary.csv")
+    gene_to_pos = build_signal.build_random_positions(list(df_a.keys())[1:])
+    signal_matrix_a = build_signal.build_signal_matrix(df_a, gene_to_pos)
+    signal_matrix_b = build_signal.build_signal_matrix(df_b, gene_to_pos)
+
+    # no disk mode : waveforms & scat features stay in memory
+    if not save_artifacts:
+        simple_clf.run_svm_clf_from_signals(signal_matrix_a, signal_matrix_b, audio_duration, n_jobs=n_jobs)
+        return
     
-    # turn into audio files
-    for signal_file in glob.glob("signals/aorta/*.csv"):
-        build_signal.turn_signal_into_audio(signal_file, audio_duration)
-    for signal_file in glob.glob("signals/coronary/*.csv"):
-        build_signal.turn_signal_into_audio(signal_file, audio_duration)
+    # save signal & turn into audio files
+    build_signal.save_signal_matrix(signal_matrix_a, "signals/aorta")
+    build_signal.turn_signal_matrix_into_audio(signal_matrix_a, "signals/aorta", audio_duration)
+    build_signal.save_signal_matrix(signal_matrix_b, "signals/coronary")
+    build_signal.turn_signal_matrix_into_audio(signal_matrix_b, "signals/coronary", audio_duration)
 
     # prepare data for classification
     file_list_a = glob.glob("signals/aorta/*.wav")
     file_list_b = glob.glob("signals/coronary/*.wav")
 
     # run classification
-    simple_clf.run_svm_clf(file_list_a, file_list_b)
+    simple_clf.run_svm_clf(file_list_a, file_list_b, n_jobs=n_jobs)
     
 
-def simple_reduced_run(output_folder):
+def simple_reduced_run(output_folder, save_artifacts:bool=True):
     """Simple binary classification on tissue dataset, use gene order computed from correlation and random
-    gene selection, basically there just to make sure this stuff compile on real data"""
+    gene selection, basically there just to make sure this stuff compile on real data, signal, audio & sample
+    files are only written if save_artifacts is set"""
 
     # params
     n_genes = 100
@@ -368,15 +409,20 @@ def simple_reduced_run(output_folder):
     extract_gene_order.get_proximity_from_data(['data/gene_reads_artery_aorta.csv', 'data/gene_reads_artery_coronary.csv'], "data/prox_matrix.csv")
     gene_to_pos = extract_gene_order.build_order_from_proximity("data/prox_matrix.csv")
     
-    # build signal
-    build_signal.build_signal_from_computed_positions("data/gene_reads_artery_aorta.csv", "signals/aorta", gene_to_pos)
-    build_signal.build_signal_from_computed_positions("data/gene_reads_artery_coronary.csv", "signals/coronary", gene_to_pos)
+    # build signal in memory
+    signal_matrix_a = build_signal.build_signal_matrix(pd.read_csv("data/gene_reads_artery_aorta.csv"), gene_to_pos)
+    signal_matrix_b = build_signal.build_signal_matrix(pd.read_csv("data/gene_reads_artery_coronary.csv"), gene_to_pos)
+
+    # no disk mode : waveforms & scat features stay in memory
+    if not save_artifacts:
+        simple_clf.run_log_clf_from_signals(signal_matrix_a, signal_matrix_b, J, Q, f"{output_folder}/results.csv", audio_duration)
+        return
     
-    # turn into audio files
-    for signal_file in glob.glob("signals/aorta/*.csv"):
-        build_signal.turn_signal_into_audio(signal_file, audio_duration)
-    for signal_file in glob.glob("signals/coronary/*.csv"):
-        build_signal.turn_signal_into_audio(signal_file, audio_duration)
+    # save signal & turn into audio files
+    build_signal.save_signal_matrix(signal_matrix_a, "signals/aorta")
+    build_signal.turn_signal_matrix_into_audio(signal_matrix_a, "signals/aorta", audio_duration)
+    build_signal.save_signal_matrix(signal_matrix_b, "signals/coronary")
+    build_signal.turn_signal_matrix_into_audio(signal_matrix_b, "signals/coronary", audio_duration)
 
     # prepare data for classification
     file_list_a = glob.glob("signals/aorta/*.wav")
@@ -399,7 +445,7 @@ def simple_reduced_run(output_folder):
 
 
 
-def simple_binary_run(output_folder:str, preprocess_data:bool, audio_duration:float, J:int, Q:int, result_file:str):
+def simple_binary_run(output_folder:str, preprocess_data:bool, audio_duration:float, J:int, Q:int, result_file:str, save_artifacts:bool=True):
     """Simple binary classification on tissue dataset, use gene order computed from correlation, used for parameters exploration
 
     WARNING : too much memory usage
@@ -412,6 +458,7 @@ def simple_binary_run(output_folder:str, preprocess_data:bool, audio_duration:fl
         - J (int) : scat features parameters 1
         - Q (int) : scat features parameters 2
         - result_save (str) : path to the file for saving results
+        - save_artifacts (bool) : if set to false, signals are kept in memory and no signal, audio or sample file is written
     
     """
 
@@ -434,15 +481,26 @@ def simple_binary_run(output_folder:str, preprocess_data:bool, audio_duration:fl
         extract_gene_order.get_proximity_from_data(['data/gene_reads_artery_aorta.csv', 'data/gene_reads_artery_coronary.csv'], "data/prox_matrix.csv")
         gene_to_pos = extract_gene_order.build_order_from_proximity("data/prox_matrix.csv")
     
-        # build signal
-        build_signal.build_signal_from_computed_positions("data/gene_reads_artery_aorta.csv", "signals/aorta", gene_to_pos)
-        build_signal.build_signal_from_computed_positions("data/gene_reads_artery_coronary.csv", "signals/coronary", gene_to_pos)
+        # build & save signal
+        signal_matrix_a = build_signal.build_signal_matrix(pd.read_csv("data/gene_reads_artery_aorta.csv"), gene_to_pos)
+        signal_matrix_b = build_signal.build_signal_matrix(pd.read_csv("data/gene_reads_artery_coronary.csv"), gene_to_pos)
+        if save_artifacts:
+            build_signal.save_signal_matrix(signal_matrix_a, "signals/aorta")
+            build_signal.save_signal_matrix(signal_matrix_b, "signals/coronary")
+
+    # reuse signals built by a previous run
+    else:
+        signal_matrix_a = build_signal.load_signal_matrix("signals/aorta")
+        signal_matrix_b = build_signal.load_signal_matrix("signals/coronary")
+
+    # no disk mode : waveforms & scat features stay in memory
+    if not save_artifacts:
+        simple_clf.run_log_clf_from_signals(signal_matrix_a, signal_matrix_b, J, Q, result_file, audio_duration)
+        return
     
     # turn into audio files
-    for signal_file in glob.glob("signals/aorta/*.csv"):
-        build_signal.turn_signal_into_audio(signal_file, audio_duration)
-    for signal_file in glob.glob("signals/coronary/*.csv"):
-        build_signal.turn_signal_into_audio(signal_file, audio_duration)
+    build_signal.turn_signal_matrix_into_audio(signal_matrix_a, "signals/aorta", audio_duration)
+    build_signal.turn_signal_matrix_into_audio(signal_matrix_b, "signals/coronary", audio_duration)
 
     # prepare data for classification
     file_list_a = glob.glob("signals/aorta/*.wav")
@@ -465,7 +523,7 @@ def simple_binary_run(output_folder:str, preprocess_data:bool, audio_duration:fl
 
 
 
-def simple_binary_gsea_run(output_folder:str, preprocess_data:bool, audio_duration:float, J:int, Q:int):
+def simple_binary_gsea_run(output_folder:str, preprocess_data:bool, audio_duration:float, J:int, Q:int, feature_store:str=None, n_jobs:int=1, save_artifacts:bool=True):
     """ Perform binary log classification on each of the dataset crafted with gsea analysis
     
     Args:
@@ -474,6 +532,10 @@ def simple_binary_gsea_run(output_folder:str, preprocess_data:bool, audio_durati
         - audio_duration (float) : duration of the audio samples (seconds)
         - J (int) : scat features parameters 1
         - Q (int) : scat features parameters 2
+        - feature_store (str) : path to a feature store folder, scat features are pulled from it when already computed
+        - n_jobs (int) : number of worker processes used for feature extraction
+        - save_artifacts (bool) : if set to False, signals are turned into waveforms and scat features in memory,
+                                  no signal, audio or sample file is written (only sample ids are kept for the report)
     
     """
 
@@ -513,35 +575,44 @@ def simple_binary_gsea_run(output_folder:str, preprocess_data:bool, audio_durati
             extract_gene_order.get_proximity_from_data([data_file, associated_data_file], f"{output_folder}/data/prox_matrix.csv")
             gene_to_pos = extract_gene_order.build_order_from_proximity(f"{output_folder}/data/prox_matrix.csv")
     
-            # build signal
-            build_signal.build_signal_from_computed_positions(data_file, f"{output_folder}/signals/{gene_set}/aorta", gene_to_pos)
-            build_signal.build_signal_from_computed_positions(associated_data_file, f"{output_folder}/signals/{gene_set}/coronary", gene_to_pos)
-    
-            # turn into audio files
-            for signal_file in glob.glob(f"{output_folder}/signals/{gene_set}/aorta/*.csv"):
-                build_signal.turn_signal_into_audio(signal_file, audio_duration)
-            for signal_file in glob.glob(f"{output_folder}/signals/{gene_set}/coronary/*.csv"):
-                build_signal.turn_signal_into_audio(signal_file, audio_duration)
-
-            # prepare data for classification
-            file_list_a = glob.glob(f"{output_folder}/signals/{gene_set}/aorta/*.wav")
-            file_list_b = glob.glob(f"{output_folder}/signals/{gene_set}/coronary/*.wav")
-
-            # take a look at random files from a
-            random_pick_a = random.sample(file_list_a, n_random_pick)
-            for audio_file in random_pick_a:
-                save_file = audio_file.split("/")[-1].replace(".wav", "_class_a.png")
-                extract_features.display_features(audio_file, J, Q, f"{output_folder}/signal_samples/{save_file}")        
-
-            # take a look at random files from b
-            random_pick_b = random.sample(file_list_b, n_random_pick)
-            for audio_file in random_pick_b:
-                save_file = audio_file.split("/")[-1].replace(".wav", "_class_b.png")
-                extract_features.display_features(audio_file, J, Q, f"{output_folder}/signal_samples/{save_file}")        
-
-            # un classification
+            # build signal in memory
+            signal_matrix_a = build_signal.build_signal_matrix(pd.read_csv(data_file), gene_to_pos)
+            signal_matrix_b = build_signal.build_signal_matrix(pd.read_csv(associated_data_file), gene_to_pos)
             result_file = f"{output_folder}/results/{gene_set}_log_clf.csv"
-            simple_clf.run_log_clf(file_list_a, file_list_b, J, Q, result_file, audio_duration)
+
+            # write signal, audio files and samples
+            if save_artifacts:
+
+                # save signal & turn into audio files
+                build_signal.save_signal_matrix(signal_matrix_a, f"{output_folder}/signals/{gene_set}/aorta")
+                build_signal.turn_signal_matrix_into_audio(signal_matrix_a, f"{output_folder}/signals/{gene_set}/aorta", audio_duration)
+                build_signal.save_signal_matrix(signal_matrix_b, f"{output_folder}/signals/{gene_set}/coronary")
+                build_signal.turn_signal_matrix_into_audio(signal_matrix_b, f"{output_folder}/signals/{gene_set}/coronary", audio_duration)
+
+                # prepare data for classification
+                file_list_a = glob.glob(f"{output_folder}/signals/{gene_set}/aorta/*.wav")
+                file_list_b = glob.glob(f"{output_folder}/signals/{gene_set}/coronary/*.wav")
+
+                # take a look at random files from a
+                random_pick_a = random.sample(file_list_a, n_random_pick)
+                for audio_file in random_pick_a:
+                    save_file = audio_file.split("/")[-1].replace(".wav", "_class_a.png")
+                    extract_features.display_features(audio_file, J, Q, f"{output_folder}/signal_samples/{save_file}")        
+
+                # take a look at random files from b
+                random_pick_b = random.sample(file_list_b, n_random_pick)
+                for audio_file in random_pick_b:
+                    save_file = audio_file.split("/")[-1].replace(".wav", "_class_b.png")
+                    extract_features.display_features(audio_file, J, Q, f"{output_folder}/signal_samples/{save_file}")        
+
+                # un classification
+                simple_clf.run_log_clf(file_list_a, file_list_b, J, Q, result_file, audio_duration, feature_store, n_jobs)
+
+            # no disk mode : waveforms & scat features stay in memory, keep sample ids for the report
+            else:
+                pd.Series(signal_matrix_a['ids']).to_csv(f"{output_folder}/signals/{gene_set}/aorta/ids.txt", index=False, header=False)
+                pd.Series(signal_matrix_b['ids']).to_csv(f"{output_folder}/signals/{gene_set}/coronary/ids.txt", index=False, header=False)
+                simple_clf.run_log_clf_from_signals(signal_matrix_a, signal_matrix_b, J, Q, result_file, audio_duration, feature_store, n_jobs)
 
             # un classification - direct
             result_file = f"{output_folder}/results_direct/{gene_set}_log_clf.csv"
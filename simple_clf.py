@@ -1,5 +1,6 @@
 import glob
-import extract_features
+import build_signal
+import manage_feature_store
 import numpy as np
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
@@ -11,9 +12,11 @@ import pandas as pd
 import umap.umap_ as umap
 
 
-def run_svm_clf(file_list_1:list, file_list_2:list):
+def run_svm_clf(file_list_1:list, file_list_2:list, feature_store:str=None, n_jobs:int=1):
     """
-    Simple exemple case, extract features from scats and used it to train a SVM
+    Simple exemple case, extract features from scats and used it to train a SVM,
+    features are pulled from feature_store (path to a feature store folder) when provided
+    and extracted with n_jobs worker processes
     """
 
     # params
@@ -21,18 +24,44 @@ def run_svm_clf(file_list_1:list, file_list_2:list):
     Q = 8
     duration = 16000
 
-    X = []
-    y = []
-    for fl in file_list_1:
-        x = extract_features.extract_features(fl, J, Q)
-        features = x.numpy().flatten()
-        X.append(features)
-        y.append("class_a")
-    for fl in file_list_2:
-        x = extract_features.extract_features(fl, J, Q)
-        features = x.numpy().flatten()
-        X.append(features)
-        y.append("class_b")
+    X = manage_feature_store.extract_features_with_store(file_list_1 + file_list_2, J, Q, duration, feature_store, n_jobs=n_jobs)
+    y = ["class_a"] * len(file_list_1) + ["class_b"] * len(file_list_2)
+
+    return train_svm_clf(X, y)
+
+
+def run_svm_clf_from_signals(signal_matrix_1:dict, signal_matrix_2:dict, audio_duration:float, feature_store:str=None, n_jobs:int=1) -> float:
+    """
+    Same as run_svm_clf but without any disk round trip : signals are turned into waveforms
+    and then into scat features in memory
+
+    Args:
+        - signal_matrix_1 (dict) : signal matrix for the class a, as returned by build_signal.build_signal_matrix
+        - signal_matrix_2 (dict) : signal matrix for the class b, as returned by build_signal.build_signal_matrix
+        - audio_duration (float) : duration of the audio samples (seconds)
+        - feature_store (str) : path to a feature store folder, if set features are pulled from it instead of recomputed
+        - n_jobs (int) : number of worker processes used for feature extraction
+
+    Returns:
+        - (float) : accuracy
+    
+    """
+
+    # params
+    J = 6 
+    Q = 8
+
+    # load data
+    waveforms_1 = build_signal.turn_signal_matrix_into_waveforms(signal_matrix_1, audio_duration)
+    waveforms_2 = build_signal.turn_signal_matrix_into_waveforms(signal_matrix_2, audio_duration)
+    X = manage_feature_store.extract_features_with_store(np.concatenate([waveforms_1, waveforms_2]), J, Q, audio_duration, feature_store, n_jobs=n_jobs)
+    y = ["class_a"] * len(waveforms_1) + ["class_b"] * len(waveforms_2)
+
+    return train_svm_clf(X, y)
+
+
+def train_svm_clf(X:np.array, y:list) -> float:
+    """Train and evaluate a linear SVM on already extracted scat features, return accuracy"""
     
     # Division en ensemble d'entraînement et de test
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
@@ -45,10 +74,12 @@ def run_svm_clf(file_list_1:list, file_list_2:list):
     y_pred = clf.predict(X_test)
     accuracy = accuracy_score(y_test, y_pred)
     print(f"[CLF][SVM] ACC : {accuracy * 100:.2f}%")
+
+    return accuracy
     
   
 
-def run_log_clf(file_list_1:list, file_list_2:list, J:int, Q:int, result_file:str, audio_duration:float) -> float:
+def run_log_clf(file_list_1:list, file_list_2:list, J:int, Q:int, result_file:str, audio_duration:float, feature_store:str=None, n_jobs:int=1) -> float:
     """
     Simple exemple case, extract features from scats and used it to train a logistic regression
 
@@ -59,6 +90,8 @@ def run_log_clf(file_list_1:list, file_list_2:list, J:int, Q:int, result_file:st
         - Q (int) : scat features parameters 2
         - result_save (str) : path to the file for saving results
         - audio_duration (float) : duration of the audio samples (seconds)
+        - feature_store (str) : path to a feature store folder, if set features are pulled from it instead of recomputed
+        - n_jobs (int) : number of worker processes used for feature extraction
 
     Returns:
         - (float) : auc
@@ -66,18 +99,56 @@ def run_log_clf(file_list_1:list, file_list_2:list, J:int, Q:int, result_file:st
     """
 
     # load data
-    X = []
-    y = []
-    for fl in file_list_1:
-        x = extract_features.extract_features(fl, J, Q)
-        features = x.numpy().flatten()
-        X.append(features)
-        y.append("class_a")
-    for fl in file_list_2:
-        x = extract_features.extract_features(fl, J, Q)
-        features = x.numpy().flatten()
-        X.append(features)
-        y.append("class_b")
+    X = manage_feature_store.extract_features_with_store(file_list_1 + file_list_2, J, Q, audio_duration, feature_store, n_jobs=n_jobs)
+    y = ["class_a"] * len(file_list_1) + ["class_b"] * len(file_list_2)
+
+    return train_log_clf(X, y, J, Q, result_file, audio_duration)
+
+
+def run_log_clf_from_signals(signal_matrix_1:dict, signal_matrix_2:dict, J:int, Q:int, result_file:str, audio_duration:float, feature_store:str=None, n_jobs:int=1) -> float:
+    """
+    Same as run_log_clf but without any disk round trip : signals are turned into waveforms
+    and then into scat features in memory
+
+    Args:
+        - signal_matrix_1 (dict) : signal matrix for the class a, as returned by build_signal.build_signal_matrix
+        - signal_matrix_2 (dict) : signal matrix for the class b, as returned by build_signal.build_signal_matrix
+        - J (int) : scat features parameters 1
+        - Q (int) : scat features parameters 2
+        - result_save (str) : path to the file for saving results, if None results are not saved
+        - audio_duration (float) : duration of the audio samples (seconds)
+        - feature_store (str) : path to a feature store folder, if set features are pulled from it instead of recomputed
+        - n_jobs (int) : number of worker processes used for feature extraction
+
+    Returns:
+        - (float) : auc
+    
+    """
+
+    # load data
+    waveforms_1 = build_signal.turn_signal_matrix_into_waveforms(signal_matrix_1, audio_duration)
+    waveforms_2 = build_signal.turn_signal_matrix_into_waveforms(signal_matrix_2, audio_duration)
+    X = manage_feature_store.extract_features_with_store(np.concatenate([waveforms_1, waveforms_2]), J, Q, audio_duration, feature_store, n_jobs=n_jobs)
+    y = ["class_a"] * len(waveforms_1) + ["class_b"] * len(waveforms_2)
+
+    return train_log_clf(X, y, J, Q, result_file, audio_duration)
+
+
+def train_log_clf(X:np.array, y:list, J:int, Q:int, result_file:str, audio_duration:float) -> float:
+    """Train and evaluate a logistic regression on already extracted scat features
+
+    Args:
+        - X (np.array) : features, one vector per sample
+        - y (list) : labels, 'class_a' or 'class_b'
+        - J (int) : scat features parameters 1
+        - Q (int) : scat features parameters 2
+        - result_save (str) : path to the file for saving results, if None results are not saved
+        - audio_duration (float) : duration of the audio samples (seconds)
+
+    Returns:
+        - (float) : auc
+    
+    """
     
     # Division en ensemble d'entraînement et de test
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
@@ -97,15 +168,16 @@ def run_log_clf(file_list_1:list, file_list_2:list, J:int, Q:int, result_file:st
     print(f"[CLF][LOG-REF] AUC : {auc}")
 
     # save results
-    output_file = open(result_file, "w")
-    output_file.write("METRIC,VALUE\n")
-    output_file.write("CLF,Logistic-Regression\n")
-    output_file.write(f"J,{J}\n")
-    output_file.write(f"Q,{Q}\n")
-    output_file.write(f"Audio-Duration,{audio_duration}\n")
-    output_file.write(f"ACC,{accuracy}\n")
-    output_file.write(f"AUC,{auc}\n")
-    output_file.close()
+    if result_file:
+        output_file = open(result_file, "w")
+        output_file.write("METRIC,VALUE\n")
+        output_file.write("CLF,Logistic-Regression\n")
+        output_file.write(f"J,{J}\n")
+        output_file.write(f"Q,{Q}\n")
+        output_file.write(f"Audio-Duration,{audio_duration}\n")
+        output_file.write(f"ACC,{accuracy}\n")
+        output_file.write(f"AUC,{auc}\n")
+        output_file.close()
 
     # return auc
     return auc
@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+
+import extract_gene_order
+
+
+def test_graph_distances_unreachable_genes(tmp_path):
+    """Genes unreachable from the chain are still all placed, at inf, in column order"""
+
+    # two components : (A, B) and (C, D), E isolated
+    genes = ["A", "B", "C", "D", "E"]
+    matrix = np.full((5, 5), np.inf)
+    np.fill_diagonal(matrix, 0.0)
+    matrix[0, 1] = matrix[1, 0] = 0.2
+    matrix[2, 3] = matrix[3, 2] = 0.5
+    distance_file = tmp_path / "dist.csv"
+    pd.DataFrame(matrix, index=genes, columns=genes).to_csv(distance_file)
+
+    gene_to_pos = extract_gene_order.extract_order_from_graph_distances(str(distance_file))
+
+    assert list(gene_to_pos) == ["A", "B", "C", "D", "E"]
+    assert gene_to_pos["A"] == 0.0
+    assert gene_to_pos["B"] == 0.2
+    assert all(np.isinf(gene_to_pos[g]) for g in ["C", "D", "E"])
+
+
+def test_graph_distances_npy_matches_csv(tmp_path):
+    """npy (memory-mapped) and csv distance matrices give the same order"""
+    rng = np.random.default_rng(0)
+    genes = [f"G{i}" for i in range(30)]
+    matrix = rng.random((30, 30))
+    matrix = (matrix + matrix.T) / 2
+    matrix[rng.random((30, 30)) < 0.3] = np.inf
+    np.fill_diagonal(matrix, 0.0)
+    pd.DataFrame(matrix, index=genes, columns=genes).to_csv(tmp_path / "dist.csv")
+    np.save(tmp_path / "dist.npy", matrix.astype(np.float32))
+    (tmp_path / "dist_nodes.txt").write_text("\n".join(genes))
+
+    from_csv = extract_gene_order.extract_order_from_graph_distances(str(tmp_path / "dist.csv"))
+    from_npy = extract_gene_order.extract_order_from_graph_distances(str(tmp_path / "dist.npy"))
+
+    assert sorted(from_csv) == sorted(genes)
+    assert list(from_csv) == list(from_npy)